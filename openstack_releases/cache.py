@@ -0,0 +1,146 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""On-disk cache of parsed deliverable files.
+"""
+
+from __future__ import print_function
+
+import glob
+import hashlib
+import os
+import os.path
+import tempfile
+
+from six.moves import cPickle as pickle
+
+# Bump this value whenever the layout of the cache file or the way
+# the deliverable data is post-processed before being cached changes,
+# so old cache files are ignored instead of returning stale data.
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'RELEASES_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'openstack-releases'),
+)
+
+_CACHE_FILE_PATTERN = 'deliverables-*.pickle'
+
+
+def content_hash(filename):
+    "Return the SHA1 hex digest of the contents of filename."
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class DeliverableCache(object):
+    """Parsed deliverable data keyed on file path and content hash.
+
+    There is one cache file per deliverables root directory. Entries
+    for files that are not looked up during a load are dropped when
+    the cache is saved, so deleted deliverable files do not linger.
+
+    """
+
+    def __init__(self, cache_dir, root_dir):
+        root_key = hashlib.sha1(
+            os.path.abspath(root_dir).encode('utf-8')
+        ).hexdigest()[:12]
+        self.filename = os.path.join(
+            cache_dir,
+            _CACHE_FILE_PATTERN.replace('*', root_key),
+        )
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._current = {}
+        self._digests = {}
+        self._dirty = False
+
+    def load(self):
+        "Read the cache file, ignoring it if it is missing or stale."
+        try:
+            with open(self.filename, 'rb') as f:
+                data = pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return
+        except Exception as e:
+            print('[deliverables] ignoring unreadable cache %s: %s' %
+                  (self.filename, e))
+            return
+        if data.get('version') != CACHE_FORMAT_VERSION:
+            print('[deliverables] ignoring cache %s with format %r' %
+                  (self.filename, data.get('version')))
+            return
+        self._entries = data.get('entries', {})
+
+    def get(self, filename):
+        """Return the cached data for filename, or None.
+
+        The content hash is remembered so a following call to
+        :meth:`set` does not have to read the file again.
+
+        """
+        digest = content_hash(filename)
+        self._digests[filename] = digest
+        entry = self._entries.get(filename)
+        if entry is not None and entry[0] == digest:
+            self.hits += 1
+            self._current[filename] = entry
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def set(self, filename, d_info):
+        "Store freshly parsed data for filename."
+        digest = self._digests.get(filename)
+        if digest is None:
+            digest = content_hash(filename)
+        self._current[filename] = (digest, d_info)
+        self._dirty = True
+
+    def save(self):
+        "Write the cache file, if anything changed."
+        if not self._dirty and set(self._current) == set(self._entries):
+            return
+        cache_dir = os.path.dirname(self.filename)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        data = {
+            'version': CACHE_FORMAT_VERSION,
+            'entries': self._current,
+        }
+        # Write to a temporary file and rename it into place so
+        # concurrent readers never see a partial cache file.
+        fd, tmpname = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmpname, self.filename)
+        except:
+            os.unlink(tmpname)
+            raise
+        self._entries = self._current
+        self._dirty = False
+
+    def report(self):
+        print('[deliverables] cache %s: %d hits, %d misses' %
+              (self.filename, self.hits, self.misses))
+
+
+def clear(cache_dir=DEFAULT_CACHE_DIR):
+    "Remove all deliverable cache files and return their names."
+    removed = []
+    for filename in glob.glob(os.path.join(cache_dir, _CACHE_FILE_PATTERN)):
+        os.unlink(filename)
+        removed.append(filename)
+    return removed
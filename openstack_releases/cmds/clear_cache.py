@@ -0,0 +1,37 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Remove the cache of parsed deliverable files.
+"""
+
+from __future__ import print_function
+
+import argparse
+
+from openstack_releases import cache
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--cache-dir',
+        default=cache.DEFAULT_CACHE_DIR,
+        help='cache directory (default=%(default)s)',
+    )
+    args = parser.parse_args()
+
+    removed = cache.clear(args.cache_dir)
+    for filename in removed:
+        print('removed %s' % filename)
+    if not removed:
+        print('no cache files found in %s' % args.cache_dir)
+    return 0
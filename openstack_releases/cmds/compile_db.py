@@ -0,0 +1,53 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compile the deliverable files into an SQLite database.
+"""
+
+from __future__ import print_function
+
+import argparse
+
+from openstack_releases import database
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--deliverables-dir',
+        default='deliverables',
+        help='location of the deliverable files (default=%(default)s)',
+    )
+    parser.add_argument(
+        'output',
+        nargs='?',
+        default='releases.db',
+        help='database file to create or refresh (default=%(default)s)',
+    )
+    args = parser.parse_args()
+
+    try:
+        results = database.compile_database(args.deliverables_dir,
+                                            args.output)
+    except ValueError as e:
+        parser.error(e)
+
+    for kind in ['added', 'changed', 'removed']:
+        for path in results[kind]:
+            print('%s %s' % (kind, path))
+    print('%d added, %d changed, %d removed, %d unchanged' % (
+        len(results['added']),
+        len(results['changed']),
+        len(results['removed']),
+        results['unchanged'],
+    ))
+    return 0
@@ -279,11 +279,22 @@ def read_projects(path):
 
 def clone_repos(save_dir, projects):
     """Clones a bunch of openstack repos."""
+    with tqdm(total=len(projects), unit='repo',
+              desc='Cloning %s repos' % len(projects)) as progress:
+        cloner = gitutils.RepoCloner(
+            save_dir,
+            [project for project, short_project in projects],
+            progress=lambda repo, error: progress.update(1),
+            # Only the history is shown.
+            history_only=True,
+        )
+        errors = cloner.wait_all()
+    for project, error in sorted(errors.items()):
+        print("Failed to clone %s: %s" % (project, error), file=sys.stderr)
     repos = {}
-    for project, short_project in tqdm(
-        projects, unit='repo', desc='Cloning %s repos' % len(projects)):
-        gitutils.clone_repo(save_dir, project)
-        repos[project] = os.path.join(save_dir, project)
+    for project, short_project in projects:
+        if project not in errors:
+            repos[project] = os.path.join(save_dir, project)
     return repos
 
 
@@ -350,6 +361,8 @@ def main():
         # likely relax this).
         repos = clone_repos(a_temp_dir, projects)
         for project, short_project in projects:
+            if project not in repos:
+                continue
             repo_path = repos[project]
             last_release_cycle, last_release_path = find_last_release_path(
                 release_repo_path, latest_cycle, cycles, short_project)
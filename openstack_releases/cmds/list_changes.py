@@ -26,11 +26,11 @@ import shutil
 import subprocess
 import tempfile
 
-import yaml
-
 from openstack_releases import defaults
 from openstack_releases import gitutils
 from openstack_releases import governance
+from openstack_releases import httputils
+from openstack_releases import yamlutils
 
 
 def header(title):
@@ -61,16 +61,31 @@ def git_log(workdir, repo, title, git_range, extra_args=[]):
 
 def git_branch_contains(workdir, repo, title, commit):
     header('%s %s' % (title, commit))
-    cmd = ['git', 'branch', '-r', '--contains', commit]
-    print('\n' + ' '.join(cmd) + '\n')
-    out = subprocess.check_output(cmd, cwd=os.path.join(workdir, repo))
-    print(out + '\n')
+    index = gitutils.get_ancestry_index(workdir, repo)
+    if index is None:
+        print('ERROR: no history index for %s, asking git' % repo)
+        cmd = ['git', 'branch', '-r', '--contains', commit]
+        print('\n' + ' '.join(cmd) + '\n')
+        out = subprocess.check_output(
+            cmd, cwd=os.path.join(workdir, repo),
+        ).decode('utf-8')
+        print(out + '\n')
+        branches = [o.strip() for o in out.splitlines()]
+    else:
+        print('\nremote branches containing %s\n' % commit)
+        branches = [
+            # Drop the prefix to match the output of "git branch -r".
+            b[len('remotes/'):]
+            for b in index.branches_containing(commit, remote_only=True)
+        ]
+        for b in branches:
+            print('  %s' % b)
     print('\nAll branches:')
     subprocess.check_call(
         ['git', 'branch', '-a'],
         cwd=os.path.join(workdir, repo),
     )
-    return [o.strip() for o in out.splitlines()]
+    return branches
 
 
 def git_diff(workdir, repo, git_range, file_pattern):
@@ -100,6 +115,21 @@ def main():
         action='store_false',
         help='do not remove temporary files',
     )
+    parser.add_argument(
+        '--offline',
+        default=False,
+        action='store_true',
+        help=('use the cached governance and zuul layout data '
+              'instead of downloading them'),
+    )
+    parser.add_argument(
+        '--governance',
+        default=governance.PROJECTS_LIST,
+        metavar='LOCATION',
+        help=('URL, file, checkout, or PATH@REF of a git repository to '
+              'read the governance projects.yaml from '
+              '(default=%(default)s, or $RELEASES_GOVERNANCE_PROJECTS)'),
+    )
     parser.add_argument(
         'input',
         nargs='*',
@@ -108,6 +138,9 @@ def main():
     )
     args = parser.parse_args()
 
+    if args.offline:
+        httputils.set_offline()
+
     filenames = args.input or gitutils.find_modified_deliverable_files()
     if not filenames:
         print('no modified deliverable files, skipping report')
@@ -126,7 +159,7 @@ def main():
             print('not cleaning up %s' % workdir)
     atexit.register(cleanup_workdir)
 
-    team_data = governance.get_team_data()
+    team_data = governance.get_team_data(args.governance)
 
     # Remove any inherited PAGER environment variable to avoid
     # blocking the output waiting for input.
@@ -139,7 +172,7 @@ def main():
         print('\n' + ('=' * 80))
         print('\nChecking %s\n' % filename)
         with open(filename, 'r') as f:
-            deliverable_info = yaml.load(f.read())
+            deliverable_info = yamlutils.load(f.read())
 
         # By default assume the project does not use milestones.
         uses_milestones = False
@@ -214,14 +247,7 @@ def main():
 
             # Check out the code.
             print('\nChecking out repository {}'.format(project['repo']))
-            subprocess.check_call(
-                ['zuul-cloner',
-                 '--branch', branch,
-                 '--workspace', workdir,
-                 'git://git.openstack.org',
-                 project['repo'],
-                 ]
-            )
+            gitutils.clone_repo(workdir, project['repo'], branch=branch)
 
             # look at the previous tag for the parent of the commit
             # getting the new release
@@ -353,14 +379,24 @@ def main():
                          project['hash']],
                         cwd=os.path.join(workdir, project['repo']),
                     )
-                print('\ngit tag --contains %s\n' %
+                    gitutils.forget_ref_snapshot(workdir, project['repo'])
+                print('\ntags containing %s\n' %
                       previous_release['version'])
-                containing_tags = subprocess.check_output(
-                    ['git', 'tag',
-                     '--contains',
-                     previous_release['version']],
-                    cwd=os.path.join(workdir, project['repo']),
-                ).split()
+                index = gitutils.get_ancestry_index(
+                    workdir, project['repo'],
+                )
+                if index is None:
+                    print('ERROR: no history index for %s, asking git' %
+                          project['repo'])
+                    containing_tags = subprocess.check_output(
+                        ['git', 'tag',
+                         '--contains',
+                         previous_release['version']],
+                        cwd=os.path.join(workdir, project['repo']),
+                    ).decode('utf-8').split()
+                else:
+                    containing_tags = index.tags_containing(
+                        previous_release['version'])
                 print('Containing tags:', containing_tags)
                 if new_release['version'] not in containing_tags:
                     print('WARNING: Missing %s' % new_release['version'])
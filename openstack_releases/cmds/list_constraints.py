@@ -22,7 +22,8 @@ import glob
 import os
 import os.path
 
-import yaml
+from openstack_releases import snapshot
+from openstack_releases import yamlutils
 
 
 def main():
@@ -31,6 +32,11 @@ def main():
         'series',
         help='the name of the release series to scan',
     )
+    parser.add_argument(
+        '--snapshot',
+        help=('read the deliverable files from this snapshot file, '
+              'rebuilding it first if any file is newer'),
+    )
     args = parser.parse_args()
 
     filenames = sorted(glob.glob('deliverables/' + args.series + '/*.yaml'))
@@ -38,9 +44,16 @@ def main():
         print('no deliverable files found under {}'.format(args.series))
         return 1
 
+    snap = None
+    if args.snapshot:
+        snap = snapshot.open_snapshot('deliverables', args.snapshot)
+
     for filename in filenames:
-        with open(filename, 'r') as f:
-            deliverable_info = yaml.load(f.read())
+        if snap is not None:
+            deliverable_info = snap.get_file('deliverables', filename)
+        else:
+            with open(filename, 'r') as f:
+                deliverable_info = yamlutils.load(f.read())
 
         deliverable_name = os.path.splitext(os.path.basename(filename))[0]
 
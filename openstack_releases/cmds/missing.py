@@ -23,13 +23,14 @@ import glob
 import os
 import os.path
 
-import yaml
-
 # Disable warnings about insecure connections.
 from requests.packages import urllib3
 
 from openstack_releases import defaults
+from openstack_releases import gitcache
 from openstack_releases import gitutils
+from openstack_releases import snapshot
+from openstack_releases import yamlutils
 
 urllib3.disable_warnings()
 
@@ -40,6 +41,31 @@ def main():
         '--series', '-s',
         help='release series to scan',
     )
+    parser.add_argument(
+        '--snapshot',
+        help=('read the deliverable files from this snapshot file, '
+              'rebuilding it first if any file is newer'),
+    )
+    parser.add_argument(
+        '--ls-remote',
+        default=False,
+        action='store_true',
+        help=('list the tags of each repository once with '
+              'git ls-remote instead of looking up every tag on cgit'),
+    )
+    parser.add_argument(
+        '--remote',
+        default=gitutils.GIT_REMOTE,
+        help=('base URL or mirror directory holding the repositories '
+              'for --ls-remote, defaults to %(default)s'),
+    )
+    parser.add_argument(
+        '--no-git-cache',
+        dest='git_cache',
+        default=True,
+        action='store_false',
+        help='ignore the cache of commits and tags already checked',
+    )
     parser.add_argument(
         'input',
         nargs='*',
@@ -48,6 +74,9 @@ def main():
     )
     args = parser.parse_args()
 
+    if not args.git_cache:
+        gitcache.disable()
+
     if args.input:
         filenames = args.input
     elif args.series:
@@ -61,36 +90,82 @@ def main():
 
     errors = []
 
+    snap = None
+    if args.snapshot:
+        snap = snapshot.open_snapshot('deliverables', args.snapshot)
+
+    # Collect the tags to look for from every file first, so they can
+    # all be checked in one batch, then report on the files in order.
+    # None stands for a file that was deleted.
+    file_checks = []
+    to_check = []
     for filename in filenames:
-        print('\nChecking %s' % filename)
         if not os.path.exists(filename):
-            print("File was deleted, skipping.")
+            file_checks.append((filename, None))
             continue
-        with open(filename, 'r') as f:
-            deliverable_info = yaml.load(f.read())
+        if snap is not None:
+            deliverable_info = snap.get_file('deliverables', filename)
+        else:
+            with open(filename, 'r') as f:
+                deliverable_info = yamlutils.load(f.read())
 
+        checks = []
         for release in deliverable_info['releases']:
-
             for project in release['projects']:
-                # Report if the version has already been
-                # tagged. We expect it to not exist, but neither
-                # case is an error because sometimes we want to
-                # import history and sometimes we want to make new
-                # releases.
-                print('%s %s' % (project['repo'], release['version']), end=' ')
-                version_exists = gitutils.tag_exists(
-                    project['repo'], release['version'],
-                )
-                if version_exists:
-                    print('found')
-                else:
-                    print('MISSING')
-                    errors.append(
-                        '%s missing tag %s' % (
-                            project['repo'],
-                            release['version'],
-                        )
+                checks.append((project['repo'], release['version']))
+        file_checks.append((filename, checks))
+        to_check.extend(checks)
+
+    unlisted = []
+    if args.ls_remote:
+        repo_tags = gitutils.get_remote_tags_for_repos(
+            (repo for repo, version in to_check),
+            remote=args.remote,
+        )
+        # None marks the tags of repositories whose list could not be
+        # read, which are reported once below instead of as missing.
+        tags_found = [
+            None if repo_tags[repo] is None
+            else str(version) in repo_tags[repo]
+            for repo, version in to_check
+        ]
+        unlisted = sorted(r for r, tags in repo_tags.items() if tags is None)
+    else:
+        tags_found = gitutils.refs_exist(
+            (repo, version, gitutils.TAG)
+            for repo, version in to_check
+        )
+    results = iter(tags_found)
+
+    for filename, checks in file_checks:
+        print('\nChecking %s' % filename)
+        if checks is None:
+            print("File was deleted, skipping.")
+            continue
+
+        for repo, version in checks:
+            # Report if the version has already been
+            # tagged. We expect it to not exist, but neither
+            # case is an error because sometimes we want to
+            # import history and sometimes we want to make new
+            # releases.
+            print('%s %s' % (repo, version), end=' ')
+            version_exists = next(results)
+            if version_exists is None:
+                print('unknown')
+            elif version_exists:
+                print('found')
+            else:
+                print('MISSING')
+                errors.append(
+                    '%s missing tag %s' % (
+                        repo,
+                        version,
                     )
+                )
+
+    for repo in unlisted:
+        errors.append('could not list tags for %s' % repo)
 
     if errors:
         print('\n\n%s errors found' % len(errors))
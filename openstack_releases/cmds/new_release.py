@@ -20,8 +20,7 @@ import shutil
 import tempfile
 
 from openstack_releases import gitutils
-
-import yaml
+from openstack_releases import yamlutils
 
 RELEASE_TEMPLATE = '''
   - version: {version}
@@ -82,7 +81,7 @@ def main():
         series, args.deliverable)
     try:
         with open(deliverable_filename, 'r') as f:
-            deliverable_info = yaml.safe_load(f)
+            deliverable_info = yamlutils.load(f)
     except (IOError, OSError) as e:
         parser.error(e)
 
@@ -103,12 +102,11 @@ def main():
 
     projects = []
     for project in last_release['projects']:
-        gitutils.clone_repo(workdir, project['repo'])
+        gitutils.clone_repo(workdir, project['repo'], history_only=True)
 
-        branches = gitutils.get_branches(workdir, project['repo'])
+        refs = gitutils.get_ref_snapshot(workdir, project['repo'])
         version = 'origin/stable/%s' % series
-        if not any(branch for branch in branches
-                   if branch.endswith(version)):
+        if refs is None or not refs.has_branch(version):
             version = 'master'
 
         sha = gitutils.sha_for_tag(workdir, project['repo'], version)
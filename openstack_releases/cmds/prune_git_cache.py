@@ -0,0 +1,41 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Remove entries from the cache of git commit and tag lookups.
+"""
+
+from __future__ import print_function
+
+import argparse
+
+from openstack_releases import gitcache
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--cache-file',
+        default=gitcache.DEFAULT_FILENAME,
+        help='cache database (default=%(default)s)',
+    )
+    parser.add_argument(
+        '--all',
+        default=False,
+        action='store_true',
+        help='remove every entry, not only expired negative answers',
+    )
+    args = parser.parse_args()
+
+    facts = gitcache.GitFactCache(args.cache_file)
+    removed = facts.prune(everything=args.all)
+    print('removed %d entries from %s' % (removed, args.cache_file))
+    return 0
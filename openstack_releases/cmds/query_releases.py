@@ -0,0 +1,73 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Find the releases of a repository or commit.
+"""
+
+from __future__ import print_function
+
+import argparse
+import contextlib
+import os
+import sys
+
+from openstack_releases import deliverable
+
+
+@contextlib.contextmanager
+def _quiet():
+    # Loading the deliverables reports progress on stdout, which
+    # would get mixed up with the query results.
+    saved = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        yield
+    finally:
+        sys.stdout.close()
+        sys.stdout = saved
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--deliverables-dir',
+        default='deliverables',
+        help='location of the deliverable files (default=%(default)s)',
+    )
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument(
+        '--repo',
+        help='show every release of the repository, such as '
+        'openstack/oslo.config',
+    )
+    group.add_argument(
+        '--hash',
+        help='show the releases made from the commit, which may be '
+        'abbreviated',
+    )
+    args = parser.parse_args()
+
+    with _quiet():
+        all_deliverables = deliverable.Deliverables(args.deliverables_dir)
+
+    if args.repo:
+        results = all_deliverables.get_repo_releases(args.repo)
+    else:
+        results = all_deliverables.get_hash_releases(args.hash)
+
+    if not results:
+        print('no releases found', file=sys.stderr)
+        return 1
+    for r in results:
+        print('{} {} {} {} {}'.format(
+            r.series, r.deliverable, r.version, r.repo, r.hash))
+    return 0
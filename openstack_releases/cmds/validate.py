@@ -27,17 +27,17 @@ import re
 import shutil
 import tempfile
 
-import requests
-import yaml
-
 # Disable warnings about insecure connections.
 from requests.packages import urllib3
 
 from openstack_releases import defaults
+from openstack_releases import gitcache
 from openstack_releases import gitutils
 from openstack_releases import governance
+from openstack_releases import httputils
 from openstack_releases import project_config
 from openstack_releases import versionutils
+from openstack_releases import yamlutils
 
 urllib3.disable_warnings()
 
@@ -56,6 +56,36 @@ def main():
         action='store_false',
         help='do not remove temporary files',
     )
+    parser.add_argument(
+        '--no-git-cache',
+        dest='git_cache',
+        default=True,
+        action='store_false',
+        help='ignore the cache of commits and tags already checked',
+    )
+    parser.add_argument(
+        '--offline',
+        default=False,
+        action='store_true',
+        help=('use the cached governance and zuul layout data '
+              'instead of downloading them'),
+    )
+    parser.add_argument(
+        '--governance',
+        default=governance.PROJECTS_LIST,
+        metavar='LOCATION',
+        help=('URL, file, checkout, or PATH@REF of a git repository to '
+              'read the governance projects.yaml from '
+              '(default=%(default)s, or $RELEASES_GOVERNANCE_PROJECTS)'),
+    )
+    parser.add_argument(
+        '--zuul-layout',
+        default=project_config.ZUUL_LAYOUT_URL,
+        metavar='LOCATION',
+        help=('URL, file, checkout, or PATH@REF of a git repository to '
+              'read the project-config zuul/layout.yaml from '
+              '(default=%(default)s, or $RELEASES_ZUUL_LAYOUT)'),
+    )
     parser.add_argument(
         'input',
         nargs='*',
@@ -64,19 +94,27 @@ def main():
     )
     args = parser.parse_args()
 
+    if args.offline:
+        httputils.set_offline()
+
+    if not args.git_cache:
+        gitcache.disable()
+
     filenames = args.input or gitutils.find_modified_deliverable_files()
     if not filenames:
         print('no modified deliverable files, validating all releases from %s'
               % defaults.RELEASE)
         filenames = glob.glob('deliverables/' + defaults.RELEASE + '/*.yaml')
 
-    zuul_layout = project_config.get_zuul_layout_data()
+    zuul_layout = project_config.get_zuul_project_templates(
+        args.zuul_layout)
 
-    team_data = governance.get_team_data()
+    team_data = governance.get_team_data(args.governance)
+    governance_index = governance.GovernanceIndex(team_data)
     independent_repos = set(
         r.name
         for r in governance.get_repositories(
-            team_data,
+            governance_index,
             tags=['release:independent'],
         )
     )
@@ -98,13 +136,39 @@ def main():
             print('not cleaning up %s' % workdir)
     atexit.register(cleanup_workdir)
 
+    # Read all of the files and look up every commit and tag they
+    # mention in one batch, before running the checks.
+    all_info = {}
+    ref_queries = []
+    to_clone = []
+    for filename in filenames:
+        if not os.path.isfile(filename):
+            continue
+        with open(filename, 'r') as f:
+            all_info[filename] = yamlutils.load(f.read())
+        for release in all_info[filename].get('releases', []):
+            for project in release.get('projects', []):
+                if not is_a_hash(project['hash']):
+                    continue
+                ref_queries.append(
+                    (project['repo'], project['hash'], gitutils.COMMIT))
+                ref_queries.append(
+                    (project['repo'], release['version'], gitutils.TAG))
+                to_clone.append(project['repo'])
+
+    # Start cloning in the background while the references are
+    # checked, and wait for each repository only when it is needed.
+    cloner = gitutils.RepoCloner(workdir, to_clone, history_only=True)
+
+    print('looking up %d references' % len(ref_queries))
+    ref_exists = dict(zip(ref_queries, gitutils.refs_exist(ref_queries)))
+
     for filename in filenames:
         print('\nChecking %s' % filename)
         if not os.path.isfile(filename):
             print("File was deleted, skipping.")
             continue
-        with open(filename, 'r') as f:
-            deliverable_info = yaml.load(f.read())
+        deliverable_info = all_info[filename]
 
         # Look for the launchpad project
         try:
@@ -114,7 +178,8 @@ def main():
             print('no launchpad project name given')
         else:
             print('launchpad project %s ' % lp_name, end='')
-            lp_resp = requests.get('https://api.launchpad.net/1.0/' + lp_name)
+            lp_resp = httputils.get(
+                'https://api.launchpad.net/1.0/' + lp_name)
             if (lp_resp.status_code // 100) == 4:
                 print('MISSING')
                 errors.append('Launchpad project %s does not exist' % lp_name)
@@ -155,7 +220,7 @@ def main():
             else:
                 links = [notes_link]
             for link in links:
-                rn_resp = requests.get(link)
+                rn_resp = httputils.get(link)
                 if (rn_resp.status_code // 100) == 2:
                     print('Release notes at %s found' % link)
                 else:
@@ -228,9 +293,9 @@ def main():
                 else:
                     # Report if the SHA exists or not (an error if it
                     # does not).
-                    sha_exists = gitutils.commit_exists(
-                        project['repo'], project['hash'],
-                    )
+                    sha_exists = ref_exists[
+                        (project['repo'], project['hash'], gitutils.COMMIT)
+                    ]
                     if not sha_exists:
                         print('MISSING', end='')
                         errors.append('No commit %(hash)r in %(repo)r'
@@ -243,11 +308,20 @@ def main():
                     # import history and sometimes we want to make new
                     # releases.
                     print('version %s ' % release['version'], end='')
-                    version_exists = gitutils.tag_exists(
-                        project['repo'], release['version'],
-                    )
-                    gitutils.clone_repo(workdir, project['repo'])
-                    if version_exists:
+                    version_exists = ref_exists[
+                        (project['repo'], release['version'], gitutils.TAG)
+                    ]
+                    clone_error = cloner.wait(project['repo'])
+                    if clone_error is not None:
+                        msg = ('Could not clone %s: %s' %
+                               (project['repo'], clone_error))
+                        print(msg)
+                        # Report the failure once per repository.
+                        if msg not in errors:
+                            errors.append(msg)
+                    if version_exists and clone_error is not None:
+                        print('found, not comparing SHAs without a clone')
+                    elif version_exists:
                         actual_sha = gitutils.sha_for_tag(
                             workdir,
                             project['repo'],
@@ -283,45 +357,49 @@ def main():
                                 print(msg)
                                 errors.append(msg)
 
-                            # Check to see if we are re-tagging the same
-                            # commit with a new version.
-                            old_sha = gitutils.sha_for_tag(
-                                workdir,
-                                project['repo'],
-                                prev_version,
-                            )
-                            if old_sha == project['hash']:
-                                print('RETAGGING')
-                            elif not is_independent:
-                                # Check to see if the commit for the new
-                                # version is in the ancestors of the
-                                # previous release, meaning it is actually
-                                # merged into the branch.
-                                is_ancestor = gitutils.check_ancestry(
+                            if clone_error is not None:
+                                print('skipping descendant test without a '
+                                      'clone')
+                            else:
+                                # Check to see if we are re-tagging the same
+                                # commit with a new version.
+                                old_sha = gitutils.sha_for_tag(
                                     workdir,
                                     project['repo'],
                                     prev_version,
-                                    project['hash'],
                                 )
-                                if is_ancestor:
-                                    print('SHA found in descendants')
-                                else:
-                                    print('SHA NOT FOUND in descendants')
-                                    if series_name == '_independent':
-                                        save = warnings.append
+                                if old_sha == project['hash']:
+                                    print('RETAGGING')
+                                elif not is_independent:
+                                    # Check to see if the commit for the new
+                                    # version is in the ancestors of the
+                                    # previous release, meaning it is actually
+                                    # merged into the branch.
+                                    is_ancestor = gitutils.check_ancestry(
+                                        workdir,
+                                        project['repo'],
+                                        prev_version,
+                                        project['hash'],
+                                    )
+                                    if is_ancestor:
+                                        print('SHA found in descendants')
                                     else:
-                                        save = errors.append
-                                    save(
-                                        '%s %s receiving %s is not a descendant of %s' % (
-                                            project['repo'],
-                                            project['hash'],
-                                            release['version'],
-                                            prev_version,
+                                        print('SHA NOT FOUND in descendants')
+                                        if series_name == '_independent':
+                                            save = warnings.append
+                                        else:
+                                            save = errors.append
+                                        save(
+                                            '%s %s receiving %s is not a descendant of %s' % (
+                                                project['repo'],
+                                                project['hash'],
+                                                release['version'],
+                                                prev_version,
+                                            )
                                         )
-                                    )
-                            else:
-                                print('skipping descendant test for independent project, '
-                                      'verify branch manually')
+                                else:
+                                    print('skipping descendant test for independent project, '
+                                          'verify branch manually')
             prev_version = release['version']
             prev_projects = set(p['repo'] for p in release['projects'])
 
@@ -343,7 +421,7 @@ def main():
         expected_repos = set(
             r.name
             for r in governance.get_repositories(
-                team_data,
+                governance_index,
                 deliverable_name=deliverable_name,
             )
         )
@@ -372,6 +450,9 @@ def main():
             print(msg)
             warnings.append(msg)
 
+    print()
+    httputils.report()
+
     if warnings:
         print('\n\n%s warnings found' % len(warnings))
         for w in warnings:
@@ -0,0 +1,252 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compact, column-oriented storage for deliverable release data.
+
+The parsed deliverable files repeat the same repository names and
+version strings many times, and store every commit hash as a
+40 character string. The store defined here keeps each distinct
+string once, refers to it by an integer id held in an array, and
+packs the hashes as 20 byte binary values in one buffer. Read-only
+mapping views give callers the same interface as the parsed YAML.
+
+"""
+
+import array
+import binascii
+import re
+
+import six
+
+try:
+    from collections import abc as collections_abc
+except ImportError:  # python 2
+    import collections as collections_abc
+
+
+_HASH_RE = re.compile('^[0-9a-f]{40}$')
+_HASH_SIZE = 20
+_NULL_HASH = b'\0' * _HASH_SIZE
+
+
+class ReleaseStore(object):
+    """Column storage for the releases of many deliverables."""
+
+    def __init__(self):
+        # Interned values, and the reverse mapping used while adding
+        # data. Values are keyed with their type so the version 1.0
+        # and the string '1.0' stay distinct.
+        self._values = []
+        self._value_ids = {}
+        # One entry per project in a release.
+        self._proj_repo = array.array('l')
+        self._proj_hashes = bytearray()
+        self._proj_extra = []
+        # One entry per release.
+        self._rel_version = array.array('l')
+        self._rel_first_proj = array.array('l')
+        self._rel_num_proj = array.array('l')
+        self._rel_extra = []
+        # Releases belonging to deliverables that were removed.
+        self._dead_releases = 0
+
+    def intern(self, value):
+        "Return the integer id for value, adding it if needed."
+        key = (type(value), value)
+        try:
+            return self._value_ids[key]
+        except KeyError:
+            value_id = len(self._values)
+            self._values.append(value)
+            self._value_ids[key] = value_id
+            return value_id
+
+    def value(self, value_id):
+        return self._values[value_id]
+
+    def _add_project(self, project):
+        extra = {}
+        for key, val in project.items():
+            if key not in ('repo', 'hash'):
+                extra[key] = val
+        self._proj_repo.append(self.intern(project['repo']))
+        sha = project.get('hash')
+        if isinstance(sha, six.string_types) and _HASH_RE.match(sha):
+            self._proj_hashes.extend(binascii.unhexlify(sha))
+        else:
+            # Keep anything that does not look like a full hash
+            # as-is so the views return the original value.
+            self._proj_hashes.extend(_NULL_HASH)
+            extra['hash'] = sha
+        self._proj_extra.append(extra or None)
+
+    def add_releases(self, releases):
+        """Add a list of releases.
+
+        Returns the index of the first release and the number of
+        releases added.
+
+        """
+        first = len(self._rel_version)
+        for release in releases:
+            projects = release.get('projects', [])
+            extra = {}
+            for key, val in release.items():
+                if key not in ('version', 'projects'):
+                    extra[key] = val
+            self._rel_version.append(self.intern(release['version']))
+            self._rel_first_proj.append(len(self._proj_repo))
+            self._rel_num_proj.append(len(projects))
+            self._rel_extra.append(extra or None)
+            for project in projects:
+                self._add_project(project)
+        return first, len(self._rel_version) - first
+
+    def add_deliverable(self, d_info):
+        "Store the parsed deliverable data and return a view of it."
+        other = {}
+        for key, val in d_info.items():
+            if key == 'releases':
+                continue
+            if key == 'team':
+                val = self.value(self.intern(val))
+            other[key] = val
+        first, count = self.add_releases(d_info.get('releases', []))
+        return DeliverableView(self, other, first, count,
+                               'releases' in d_info)
+
+    def remove_deliverable(self, view):
+        """Record that the releases behind view are no longer used.
+
+        The rows stay in place, since other views may still refer to
+        them. See :meth:`should_compact`.
+
+        """
+        if isinstance(view, DeliverableView) and view._store is self:
+            self._dead_releases += view._count
+
+    def should_compact(self):
+        """Return True if most of the stored releases are no longer used.
+
+        The caller should then add the deliverables it still uses to a
+        new store and drop this one.
+
+        """
+        return self._dead_releases * 2 > len(self._rel_version)
+
+    def project_hash(self, index):
+        extra = self._proj_extra[index]
+        if extra is not None and 'hash' in extra:
+            return extra['hash']
+        start = index * _HASH_SIZE
+        sha = binascii.hexlify(self._proj_hashes[start:start + _HASH_SIZE])
+        return sha.decode('ascii')
+
+
+class _View(collections_abc.Mapping):
+    """Base class for the read-only mapping views."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self.items()))
+
+
+class ProjectView(_View):
+
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    def _extra(self):
+        return self._store._proj_extra[self._index] or {}
+
+    def __getitem__(self, key):
+        if key == 'repo':
+            return self._store.value(self._store._proj_repo[self._index])
+        if key == 'hash':
+            return self._store.project_hash(self._index)
+        return self._extra()[key]
+
+    def __iter__(self):
+        yield 'repo'
+        yield 'hash'
+        for key in self._extra():
+            if key != 'hash':
+                yield key
+
+    def __len__(self):
+        return 2 + len([k for k in self._extra() if k != 'hash'])
+
+
+class ReleaseView(_View):
+
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    def _extra(self):
+        return self._store._rel_extra[self._index] or {}
+
+    def __getitem__(self, key):
+        store = self._store
+        if key == 'version':
+            return store.value(store._rel_version[self._index])
+        if key == 'projects':
+            first = store._rel_first_proj[self._index]
+            return [
+                ProjectView(store, i)
+                for i in range(first, first + store._rel_num_proj[self._index])
+            ]
+        return self._extra()[key]
+
+    def __iter__(self):
+        yield 'version'
+        yield 'projects'
+        for key in self._extra():
+            yield key
+
+    def __len__(self):
+        return 2 + len(self._extra())
+
+
+class DeliverableView(_View):
+
+    __slots__ = ('_store', '_other', '_first', '_count', '_has_releases')
+
+    def __init__(self, store, other, first, count, has_releases=True):
+        self._store = store
+        self._other = other
+        self._first = first
+        self._count = count
+        self._has_releases = has_releases
+
+    def __getitem__(self, key):
+        if key == 'releases' and self._has_releases:
+            return [
+                ReleaseView(self._store, i)
+                for i in range(self._first, self._first + self._count)
+            ]
+        return self._other[key]
+
+    def __iter__(self):
+        for key in self._other:
+            yield key
+        if self._has_releases:
+            yield 'releases'
+
+    def __len__(self):
+        return len(self._other) + int(self._has_releases)
@@ -0,0 +1,239 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compile the deliverable files into an SQLite database.
+
+The database holds the same collapsed release history as
+:class:`openstack_releases.deliverable.Deliverables`, in tables meant
+for reporting queries:
+
+``deliverables``
+  One row per deliverable file, with the series, deliverable name,
+  team, content hash, and the full parsed data as JSON.
+``releases``
+  One row per release, in file order.
+``projects``
+  One row per repository included in a release.
+``teams``
+  The names of all teams that own a deliverable.
+
+"""
+
+from __future__ import print_function
+
+import glob
+import json
+import os
+import os.path
+import sqlite3
+
+from openstack_releases import cache
+
+# Bump this value when the schema changes. Existing databases with a
+# different version are rebuilt from scratch.
+SCHEMA_VERSION = 1
+
+_SQLITE_MAGIC = b'SQLite format 3\0'
+
+_SCHEMA = """
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE teams (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE deliverables (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    sha1 TEXT NOT NULL,
+    series TEXT NOT NULL,
+    name TEXT NOT NULL,
+    team TEXT,
+    release_type TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX deliverables_series ON deliverables (series);
+CREATE INDEX deliverables_name ON deliverables (name);
+CREATE INDEX deliverables_team ON deliverables (team);
+CREATE TABLE releases (
+    id INTEGER PRIMARY KEY,
+    deliverable_id INTEGER NOT NULL
+        REFERENCES deliverables (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    version TEXT NOT NULL
+);
+CREATE INDEX releases_deliverable ON releases (deliverable_id);
+CREATE INDEX releases_version ON releases (version);
+CREATE TABLE projects (
+    release_id INTEGER NOT NULL
+        REFERENCES releases (id) ON DELETE CASCADE,
+    repo TEXT NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE INDEX projects_release ON projects (release_id);
+CREATE INDEX projects_repo ON projects (repo);
+CREATE INDEX projects_hash ON projects (hash);
+"""
+
+
+def is_database(filename):
+    "Return boolean indicating whether filename is an SQLite database."
+    try:
+        with open(filename, 'rb') as f:
+            return f.read(len(_SQLITE_MAGIC)) == _SQLITE_MAGIC
+    except (IOError, OSError):
+        return False
+
+
+def _connect(filename):
+    conn = sqlite3.connect(filename)
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+
+def _schema_version(conn):
+    try:
+        row = conn.execute(
+            "SELECT value FROM meta WHERE key = 'schema_version'"
+        ).fetchone()
+    except sqlite3.DatabaseError:
+        return None
+    return int(row[0]) if row else None
+
+
+def _relative_path(root_dir, filename):
+    # Use the same separator on every platform so the database can be
+    # shared.
+    return '/'.join(os.path.relpath(filename, root_dir).split(os.sep))
+
+
+def _insert_deliverable(conn, path, sha1, series, name, d_info):
+    cursor = conn.execute(
+        'INSERT INTO deliverables '
+        '(path, sha1, series, name, team, release_type, data) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (path, sha1, series, name, d_info.get('team'),
+         d_info.get('release-type', 'std'), json.dumps(d_info)),
+    )
+    deliverable_id = cursor.lastrowid
+    for position, release in enumerate(d_info.get('releases', [])):
+        cursor = conn.execute(
+            'INSERT INTO releases (deliverable_id, position, version) '
+            'VALUES (?, ?, ?)',
+            (deliverable_id, position, str(release['version'])),
+        )
+        release_id = cursor.lastrowid
+        conn.executemany(
+            'INSERT INTO projects (release_id, repo, hash) '
+            'VALUES (?, ?, ?)',
+            [(release_id, p['repo'], p['hash'])
+             for p in release.get('projects', [])],
+        )
+
+
+def compile_database(root_dir, filename):
+    """Create or refresh the database in filename from root_dir.
+
+    Only files whose content hash changed since the last run are
+    parsed again. Returns a dict with lists of the relative paths of
+    the files that were added, changed, and removed, and the number
+    left unchanged.
+
+    """
+    # Imported here to avoid a circular import, since deliverable
+    # opens databases built by this module.
+    from openstack_releases import deliverable
+
+    if (os.path.exists(filename) and os.path.getsize(filename) and
+            not is_database(filename)):
+        raise ValueError('%s exists and is not an SQLite database' %
+                         filename)
+    conn = _connect(filename)
+    try:
+        if _schema_version(conn) != SCHEMA_VERSION:
+            print('[database] creating new schema in %s' % filename)
+            conn.close()
+            os.unlink(filename)
+            conn = _connect(filename)
+            conn.executescript(_SCHEMA)
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('schema_version', ?)",
+                (str(SCHEMA_VERSION),),
+            )
+
+        known = dict(conn.execute('SELECT path, sha1 FROM deliverables'))
+        results = {'added': [], 'changed': [], 'removed': [], 'unchanged': 0}
+        seen = set()
+        for yaml_file in sorted(glob.glob(os.path.join(root_dir,
+                                                       '*/*.yaml'))):
+            path = _relative_path(root_dir, yaml_file)
+            seen.add(path)
+            sha1 = cache.content_hash(yaml_file)
+            if known.get(path) == sha1:
+                results['unchanged'] += 1
+                continue
+            if path in known:
+                results['changed'].append(path)
+                conn.execute('DELETE FROM deliverables WHERE path = ?',
+                             (path,))
+            else:
+                results['added'].append(path)
+            print('[database] reading %s' % yaml_file)
+            _, series, name, d_info = deliverable._load_deliverable_file(
+                yaml_file)
+            _insert_deliverable(conn, path, sha1, series, name, d_info)
+        for path in sorted(set(known) - seen):
+            results['removed'].append(path)
+            conn.execute('DELETE FROM deliverables WHERE path = ?', (path,))
+
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('root_dir', ?)",
+            (root_dir,),
+        )
+        conn.execute('DELETE FROM teams')
+        conn.execute(
+            'INSERT INTO teams (name) SELECT DISTINCT team FROM deliverables '
+            'WHERE team IS NOT NULL'
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return results
+
+
+def read_deliverables(filename):
+    """Yield the contents of the database in filename.
+
+    Produces tuples containing the name of the original deliverable
+    file, series, deliverable name, team, and parsed data of each
+    file, sorted by filename.
+
+    """
+    conn = _connect(filename)
+    try:
+        if _schema_version(conn) != SCHEMA_VERSION:
+            raise ValueError(
+                '%s does not contain a version %s deliverables database' %
+                (filename, SCHEMA_VERSION))
+        root_dir = conn.execute(
+            "SELECT value FROM meta WHERE key = 'root_dir'"
+        ).fetchone()[0]
+        rows = conn.execute(
+            'SELECT path, series, name, team, data FROM deliverables '
+            'ORDER BY path'
+        )
+        for path, series, name, team, data in rows:
+            yield (os.path.join(root_dir, *path.split('/')),
+                   series, name, team, json.loads(data))
+    finally:
+        conn.close()
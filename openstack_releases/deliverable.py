@@ -16,12 +16,19 @@
 
 from __future__ import print_function
 
+import bisect
 import collections
 import glob
+import multiprocessing
 import os
 
 import pbr.version
-import yaml
+
+from openstack_releases import cache
+from openstack_releases import compact as compact_store
+from openstack_releases import database
+from openstack_releases import snapshot as snapshot_file
+from openstack_releases import yamlutils
 
 
 def _safe_semver(v):
@@ -56,10 +63,59 @@ def _safe_semver(v):
     return pbr.version.SemanticVersion.from_pip_string(v)
 
 
+# Rank the pre-release types the same way pbr does when it sorts
+# SemanticVersion instances, so we can use plain integers in the key.
+_PRERELEASE_RANK = {'a': 0, 'b': 1, 'rc': 2, 'z': 3}
+
+# The sort key and collapse details for a version string. final is the
+# short version of a release that pbr can parse without any cleanup,
+# and None for legacy versions it cannot parse.
+_VersionInfo = collections.namedtuple(
+    '_VersionInfo',
+    ['sort_key', 'final', 'is_prerelease'],
+)
+
+# Map version strings to _VersionInfo instances. Many deliverables
+# share version numbers, so this is shared across all of the files
+# loaded by a process.
+_version_info_cache = {}
+
+
+def _version_info(version):
+    """Return the memoized _VersionInfo for the version string."""
+    version = str(version)
+    try:
+        return _version_info_cache[version]
+    except KeyError:
+        pass
+    # pbr compares SemanticVersion instances using this tuple. Compute
+    # it once, with the pre-release type converted to an integer, so
+    # sorting compares plain tuples instead of calling back into pbr.
+    semver_key = _safe_semver(version)._sort_key()
+    sort_key = (
+        semver_key[:4] +
+        (_PRERELEASE_RANK[semver_key[4]],) +
+        semver_key[5:]
+    )
+    try:
+        parsed_vers = pbr.version.SemanticVersion.from_pip_string(version)
+    except Exception:
+        # If we can't parse the version, it must be some sort of made
+        # up legacy tag.
+        final = None
+        is_prerelease = False
+    else:
+        final = parsed_vers.brief_string()
+        is_prerelease = len(parsed_vers.version_tuple()) != 3
+    result = _VersionInfo(sort_key, final, is_prerelease)
+    _version_info_cache[version] = result
+    return result
+
+
 def _version_sort_key(release):
     """Return a value we can compare for sorting.
     """
-    return _safe_semver(release['version'])
+    return _version_info(release['version']).sort_key
 
 
 def _collapse_deliverable_history(name, info):
@@ -76,20 +132,16 @@ def _collapse_deliverable_history(name, info):
     releases = []
     known_versions = set()
     for r in reversed(sorted_releases):
-        try:
-            parsed_vers = pbr.version.SemanticVersion.from_pip_string(
-                str(r['version']))
-            vers_tuple = parsed_vers.version_tuple()
-        except:
+        v_info = _version_info(r['version'])
+        if v_info.final is None:
             # If we can't parse the version, it must be some sort
-            # of made up legacy tag. Ignore the parse error
-            # and include the value in our output.
+            # of made up legacy tag. Include the value in our output.
             releases.append(r)
         else:
-            if len(vers_tuple) != 3:
+            if v_info.is_prerelease:
                 # This is not a normal release, so assume it
                 # is a pre-release.
-                final = parsed_vers.brief_string()
+                final = v_info.final
                 if final in known_versions:
                     print('[deliverables] ignoring %s %s' %
                           (name, r['version']))
@@ -99,10 +151,149 @@ def _collapse_deliverable_history(name, info):
     info['releases'] = list(reversed(releases))
 
 
+# One project entry in one release of a deliverable, as returned by
+# the reverse lookup methods of Deliverables.
+ReleaseRecord = collections.namedtuple(
+    'ReleaseRecord',
+    ['series', 'deliverable', 'version', 'repo', 'hash'],
+)
+
+# The result of Deliverables.refresh(). added, changed, and removed
+# are sorted lists of filenames. teams and series are sets of the
+# names of all teams and series affected by those files, before or
+# after the change.
+DeliverableChanges = collections.namedtuple(
+    'DeliverableChanges',
+    ['added', 'changed', 'removed', 'teams', 'series'],
+)
+
+
+def _file_stat(filename):
+    st = os.stat(filename)
+    return (st.st_mtime, st.st_size)
+
+
+def _series_from_filename(filename):
+    return os.path.basename(os.path.dirname(filename))
+
+
+def _deliverable_from_filename(filename):
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def _load_deliverable_file(filename):
+    """Read one deliverable file and collapse its history.
+
+    This is a module-level function so it can be handed to a process
+    pool. Returns a tuple containing the filename, series, deliverable
+    name, and parsed deliverable file content.
+
+    """
+    series = _series_from_filename(filename)
+    deliverable = _deliverable_from_filename(filename)
+    with open(filename, 'r') as f:
+        d_info = yamlutils.load(f.read())
+    _collapse_deliverable_history(deliverable, d_info)
+    return (filename, series, deliverable, d_info)
+
+
+def _read_team(filename):
+    """Return the team name from a deliverable file without parsing it.
+
+    Only the top-level ``team:`` line is decoded. If there is no such
+    line, the whole file is parsed.
+
+    """
+    with open(filename, 'r') as f:
+        for line in f:
+            if line.startswith('team:'):
+                return yamlutils.load(line)['team']
+        f.seek(0)
+        return yamlutils.load(f.read())['team']
+
+
+def _load_serial(filenames):
+    for filename in filenames:
+        print('[deliverables] reading %s' % filename)
+        yield _load_deliverable_file(filename)
+
+
+def _load_parallel(filenames, workers):
+    try:
+        pool = multiprocessing.Pool(workers)
+    except (ImportError, OSError) as e:
+        # Some environments (no /dev/shm, restricted sandboxes) cannot
+        # start worker processes, so fall back to reading serially.
+        print('[deliverables] could not start %s workers (%s), '
+              'reading serially' % (workers, e))
+        for result in _load_serial(filenames):
+            yield result
+        return
+    try:
+        print('[deliverables] reading %d files with %d workers' %
+              (len(filenames), workers))
+        # map() returns the results in the same order as the input,
+        # so the indexes are built exactly as they are for a serial
+        # load.
+        results = pool.map(
+            _load_deliverable_file,
+            filenames,
+            chunksize=max(1, len(filenames) // (workers * 4)),
+        )
+    finally:
+        pool.close()
+        pool.join()
+    for result in results:
+        yield result
+
+
 class Deliverables(object):
 
-    def __init__(self, root_dir):
+    def __init__(self, root_dir, workers=1,
+                 cache_dir=cache.DEFAULT_CACHE_DIR, lazy=False,
+                 compact=False, snapshot=None):
+        """Load the deliverable files found under root_dir.
+
+        :param root_dir: Directory containing the series directories,
+            or an SQLite database built by
+            :func:`openstack_releases.database.compile_database`.
+        :param workers: Number of processes to use to parse the
+            files. 1 (the default) reads the files serially in this
+            process. None uses one process per CPU.
+        :param cache_dir: Directory holding the cache of parsed
+            deliverable files. None disables the cache.
+        :param lazy: Build the indexes from the directory listing and
+            the ``team`` line of each file, and only parse a file the
+            first time its content is requested. The cache and
+            workers settings are ignored in this mode.
+        :param compact: Keep the release data in a
+            :class:`~openstack_releases.compact.ReleaseStore` and
+            return read-only mapping views of it, to reduce the memory
+            used by long-running consumers.
+        :param snapshot: Name of a snapshot file (see
+            :mod:`openstack_releases.snapshot`) to load from instead of
+            the YAML files. The snapshot is rebuilt first if any
+            deliverable file changed since it was written. Files are
+            decoded from the snapshot the first time they are
+            requested.
+
+        """
         self._root_dir = root_dir
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self._workers = workers
+        self._lazy = lazy
+        if compact:
+            self._store = compact_store.ReleaseStore()
+        else:
+            self._store = None
+        self._snapshot = None
+        self._snapshot_paths = {}
+        if cache_dir and not lazy and not snapshot and \
+                not database.is_database(root_dir):
+            self._cache = cache.DeliverableCache(cache_dir, root_dir)
+        else:
+            self._cache = None
 
         # Map team names to a list of all of their deliverables.
         self._team_deliverables = collections.defaultdict(set)
@@ -113,41 +304,346 @@ class Deliverables(object):
         # files.
         self._by_team_and_series = collections.defaultdict(list)
         self._by_series = collections.defaultdict(list)
-        # Map filenames to parsed content.
+        # Map filenames to parsed content. In lazy mode this is filled
+        # in as files are requested.
         self._by_filename = {}
+        # Map filenames to the team named in the file, and to the
+        # (mtime, size) seen when the file was read, for refresh().
+        self._team_by_filename = {}
+        self._stats = {}
+        # Reverse indexes over the release data, built the first time
+        # one of the query methods is used. Map repo names and full
+        # commit hashes to lists of ReleaseRecord, and (series,
+        # deliverable) to a dict mapping version strings to releases.
+        self._release_indexes_built = False
+        self._by_repo = collections.defaultdict(list)
+        self._by_hash = collections.defaultdict(list)
+        self._by_version = {}
+        self._sorted_hashes = None
+        # Map filenames to the ReleaseRecords added to the reverse
+        # indexes, so they can be removed again.
+        self._records_by_filename = {}
 
-        self._load_deliverable_files(root_dir)
+        if database.is_database(root_dir):
+            self._load_database(root_dir)
+        elif snapshot:
+            self._load_snapshot(root_dir, snapshot)
+        elif lazy:
+            self._index_deliverable_files(root_dir)
+        else:
+            self._load_deliverable_files(root_dir)
 
-    def _load_deliverable_files(self, root_dir):
-        deliverable_files = glob.glob(os.path.join(root_dir, '*/*.yaml'))
-        for filename in sorted(deliverable_files):
-            print('[deliverables] reading %s' % filename)
-            series = self._series_from_filename(filename)
-            deliverable = self._deliverable_from_filename(filename)
-            with open(filename, 'r') as f:
-                d_info = yaml.load(f.read())
-                _collapse_deliverable_history(deliverable, d_info)
-            team = d_info['team']
+    def _load_database(self, filename):
+        print('[deliverables] reading database %s' % filename)
+        self._lazy = False
+        for d_filename, series, deliverable, team, d_info in \
+                database.read_deliverables(filename):
             self._add_deliverable_file(
-                filename, series, team, deliverable, d_info,
+                d_filename, series, team, deliverable, d_info,
             )
 
-    @staticmethod
-    def _series_from_filename(filename):
-        return os.path.basename(os.path.dirname(filename))
+    def _load_snapshot(self, root_dir, filename):
+        self._snapshot = snapshot_file.open_snapshot(root_dir, filename)
+        print('[deliverables] reading snapshot %s' % filename)
+        self._lazy = True
+        for path, series, deliverable, team in self._snapshot.entries():
+            d_filename = os.path.join(root_dir, *path.split('/'))
+            self._snapshot_paths[d_filename] = path
+            self._add_deliverable_file(
+                d_filename, series, team, deliverable, None,
+            )
 
-    @staticmethod
-    def _deliverable_from_filename(filename):
-        return os.path.splitext(os.path.basename(filename))[0]
+    def _index_deliverable_files(self, root_dir):
+        deliverable_files = sorted(
+            glob.glob(os.path.join(root_dir, '*/*.yaml'))
+        )
+        for filename in deliverable_files:
+            self._add_deliverable_file(
+                filename,
+                self._series_from_filename(filename),
+                _read_team(filename),
+                self._deliverable_from_filename(filename),
+                None,
+            )
+
+    def _load_deliverable_files(self, root_dir):
+        deliverable_files = sorted(
+            glob.glob(os.path.join(root_dir, '*/*.yaml'))
+        )
+        cached = {}
+        to_parse = deliverable_files
+        if self._cache is not None:
+            self._cache.load()
+            to_parse = []
+            for filename in deliverable_files:
+                d_info = self._cache.get(filename)
+                if d_info is None:
+                    to_parse.append(filename)
+                else:
+                    cached[filename] = d_info
+        if self._workers > 1 and len(to_parse) > 1:
+            loaded = _load_parallel(to_parse, self._workers)
+        else:
+            loaded = _load_serial(to_parse)
+        for filename, series, deliverable, d_info in loaded:
+            if self._cache is not None:
+                self._cache.set(filename, d_info)
+            cached[filename] = d_info
+        # Add the files in sorted order, whether they came from the
+        # cache or not, so the indexes do not depend on which files
+        # had to be parsed.
+        for filename in deliverable_files:
+            d_info = cached[filename]
+            self._add_deliverable_file(
+                filename,
+                self._series_from_filename(filename),
+                d_info['team'],
+                self._deliverable_from_filename(filename),
+                d_info,
+            )
+        if self._cache is not None:
+            try:
+                self._cache.save()
+            except (IOError, OSError) as e:
+                print('[deliverables] could not save cache: %s' % e)
+            self._cache.report()
+
+    _series_from_filename = staticmethod(_series_from_filename)
+    _deliverable_from_filename = staticmethod(_deliverable_from_filename)
 
     def _add_deliverable_file(self, filename, series, team, deliverable,
                               d_info):
-        self._by_filename[filename] = d_info
-        self._by_team_and_series[(team, series)].append(filename)
-        self._by_series[series].append(filename)
+        if d_info is not None:
+            if self._store is not None:
+                d_info = self._store.add_deliverable(d_info)
+            self._by_filename[filename] = d_info
+        if os.path.exists(filename):
+            self._stats[filename] = _file_stat(filename)
+        self._team_by_filename[filename] = team
+        # Use insort() so files added by refresh() end up in the same
+        # place they would have after a full load.
+        bisect.insort(self._by_team_and_series[(team, series)], filename)
+        bisect.insort(self._by_series[series], filename)
         self._team_deliverables[team].add(deliverable)
         self._team_series[team].add(series)
 
+    def _remove_deliverable_file(self, filename):
+        series = self._series_from_filename(filename)
+        deliverable = self._deliverable_from_filename(filename)
+        team = self._team_by_filename.pop(filename)
+        d_info = self._by_filename.pop(filename, None)
+        if self._store is not None and d_info is not None:
+            self._store.remove_deliverable(d_info)
+        self._stats.pop(filename, None)
+        self._snapshot_paths.pop(filename, None)
+
+        self._by_team_and_series[(team, series)].remove(filename)
+        if not self._by_team_and_series[(team, series)]:
+            del self._by_team_and_series[(team, series)]
+            self._team_series[team].discard(series)
+        self._by_series[series].remove(filename)
+        if not self._by_series[series]:
+            del self._by_series[series]
+        # The team may still produce the deliverable in another series.
+        if not any(self._deliverable_from_filename(f) == deliverable
+                   for s in self._team_series[team]
+                   for f in self._by_team_and_series[(team, s)]):
+            self._team_deliverables[team].discard(deliverable)
+        if not self._team_series[team]:
+            del self._team_series[team]
+            del self._team_deliverables[team]
+
+        if self._release_indexes_built:
+            self._unindex_releases(filename)
+        return team, series
+
+    def refresh(self):
+        """Re-read the deliverable files that changed since they were read.
+
+        The deliverables directory is scanned and the modification
+        time and size of each file are compared with the values seen
+        when it was last read. Only files that were added, changed, or
+        removed are processed, and all of the indexes are updated in
+        place, including the team and series membership of files
+        whose team changed.
+
+        :returns: A :class:`DeliverableChanges` instance.
+
+        """
+        if database.is_database(self._root_dir):
+            raise RuntimeError('cannot refresh deliverables read from %s' %
+                               self._root_dir)
+        current = {}
+        for filename in glob.glob(os.path.join(self._root_dir, '*/*.yaml')):
+            current[filename] = _file_stat(filename)
+        known = set(self._stats)
+        added = sorted(set(current) - known)
+        removed = sorted(known - set(current))
+        changed = sorted(
+            f for f in known.intersection(current)
+            if current[f] != self._stats[f]
+        )
+
+        teams = set()
+        series = set()
+        for filename in removed + changed:
+            print('[deliverables] forgetting %s' % filename)
+            team, s = self._remove_deliverable_file(filename)
+            teams.add(team)
+            series.add(s)
+        for filename in sorted(changed + added):
+            print('[deliverables] reading %s' % filename)
+            s = self._series_from_filename(filename)
+            if self._lazy:
+                team = _read_team(filename)
+                d_info = None
+            else:
+                d_info = _load_deliverable_file(filename)[-1]
+                team = d_info['team']
+            self._add_deliverable_file(
+                filename, s, team,
+                self._deliverable_from_filename(filename),
+                d_info,
+            )
+            if self._release_indexes_built:
+                self._index_releases(filename)
+            teams.add(team)
+            series.add(s)
+        if self._store is not None and self._store.should_compact():
+            self._compact_store()
+        return DeliverableChanges(added, changed, removed, teams, series)
+
+    def _compact_store(self):
+        # The store only grows, so copy the deliverables still in use
+        # to a new one. Views handed out earlier keep the old store
+        # alive until they are dropped.
+        print('[deliverables] compacting release store')
+        store = compact_store.ReleaseStore()
+        for filename in sorted(self._by_filename):
+            self._by_filename[filename] = store.add_deliverable(
+                self._by_filename[filename])
+        self._store = store
+        if self._release_indexes_built:
+            for filename in sorted(self._by_filename):
+                self._unindex_releases(filename)
+                self._index_releases(filename)
+
+    def _get_deliverable_info(self, filename):
+        try:
+            return self._by_filename[filename]
+        except KeyError:
+            if not self._lazy:
+                return {}
+        if filename in self._snapshot_paths:
+            d_info = self._snapshot.get(self._snapshot_paths[filename])
+            _collapse_deliverable_history(
+                self._deliverable_from_filename(filename),
+                d_info,
+            )
+        elif os.path.exists(filename):
+            d_info = _load_deliverable_file(filename)[-1]
+        else:
+            return {}
+        if self._store is not None:
+            d_info = self._store.add_deliverable(d_info)
+        self._by_filename[filename] = d_info
+        return d_info
+
+    def _build_release_indexes(self):
+        if self._release_indexes_built:
+            return
+        for filename in sorted(self._all_filenames()):
+            self._index_releases(filename)
+        self._release_indexes_built = True
+
+    def _all_filenames(self):
+        "Return the names of all known files, parsed or not."
+        for filenames in self._by_series.values():
+            for filename in filenames:
+                yield filename
+
+    def _index_releases(self, filename):
+        series = self._series_from_filename(filename)
+        deliverable = self._deliverable_from_filename(filename)
+        by_version = {}
+        records = []
+        for release in self._get_deliverable_info(filename).get(
+                'releases', []):
+            version = str(release['version'])
+            by_version[version] = release
+            for project in release.get('projects', []):
+                record = ReleaseRecord(
+                    series, deliverable, version,
+                    project['repo'], project['hash'],
+                )
+                self._by_repo[record.repo].append(record)
+                self._by_hash[record.hash].append(record)
+                records.append(record)
+        self._by_version[(series, deliverable)] = by_version
+        self._records_by_filename[filename] = records
+        self._sorted_hashes = None
+
+    def _unindex_releases(self, filename):
+        for record in self._records_by_filename.pop(filename, []):
+            for index, key in [(self._by_repo, record.repo),
+                               (self._by_hash, record.hash)]:
+                index[key].remove(record)
+                if not index[key]:
+                    del index[key]
+        self._by_version.pop(
+            (self._series_from_filename(filename),
+             self._deliverable_from_filename(filename)),
+            None,
+        )
+        self._sorted_hashes = None
+
+    def get_repo_releases(self, repo):
+        """Return all releases of a repository, across all series.
+
+        :param repo: Long name of the repository, such as
+            'openstack/oslo.config'.
+        :returns: List of :class:`ReleaseRecord` instances.
+
+        """
+        self._build_release_indexes()
+        return list(self._by_repo.get(repo, []))
+
+    def get_hash_releases(self, sha):
+        """Return the releases made from a commit.
+
+        :param sha: The full commit hash, or an unambiguous
+            abbreviation of it.
+        :returns: List of :class:`ReleaseRecord` instances.
+
+        """
+        self._build_release_indexes()
+        if sha in self._by_hash:
+            return list(self._by_hash[sha])
+        if len(sha) < 4:
+            # Follow git and refuse to guess from very short prefixes.
+            return []
+        if self._sorted_hashes is None:
+            self._sorted_hashes = sorted(self._by_hash)
+        # Look for abbreviated hashes in the sorted list of full
+        # hashes. All of the matches are adjacent.
+        results = []
+        pos = bisect.bisect_left(self._sorted_hashes, sha)
+        while (pos < len(self._sorted_hashes) and
+               self._sorted_hashes[pos].startswith(sha)):
+            results.extend(self._by_hash[self._sorted_hashes[pos]])
+            pos += 1
+        return results
+
+    def get_release(self, series, deliverable, version):
+        """Return the release data for one version of a deliverable.
+
+        Returns None if there is no such release.
+
+        """
+        self._build_release_indexes()
+        by_version = self._by_version.get((series, deliverable), {})
+        return by_version.get(str(version))
+
     def get_team_deliverables(self, team):
         "Returns a list of deliverable names produced by the team."
         return list(sorted(self._team_deliverables[team]))
@@ -180,5 +676,5 @@ class Deliverables(object):
                 team,
                 self._series_from_filename(filename),
                 self._deliverable_from_filename(filename),
-                self._by_filename.get(filename, {}),
+                self._get_deliverable_info(filename),
             )
@@ -0,0 +1,151 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""On-disk cache of facts about git repositories.
+
+Once a commit or a tag has been seen in a repository, that answer
+does not change, so it is kept forever. A negative answer may just
+mean the commit has not merged or the tag has not been pushed yet, so
+it is only trusted for ``NEGATIVE_TTL`` seconds
+(``$RELEASES_GIT_NEGATIVE_TTL``, default 10 minutes).
+
+The cache is an SQLite database in the same directory as the
+deliverable cache, so several processes can read and update it at
+the same time.
+
+"""
+
+import os
+import os.path
+import sqlite3
+import threading
+import time
+
+from openstack_releases import cache
+
+DEFAULT_FILENAME = os.path.join(cache.DEFAULT_CACHE_DIR, 'git-facts.db')
+
+NEGATIVE_TTL = int(os.environ.get('RELEASES_GIT_NEGATIVE_TTL', 600))
+
+# Kinds of fact stored in the cache.
+COMMIT_EXISTS = 'commit-exists'
+TAG_EXISTS = 'tag-exists'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS facts (
+    kind TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    value TEXT NOT NULL,
+    positive INTEGER NOT NULL,
+    checked REAL NOT NULL,
+    PRIMARY KEY (kind, repo, ref)
+);
+"""
+
+
+class GitFactCache(object):
+    """Cached answers keyed on the kind of fact, repository, and ref."""
+
+    def __init__(self, filename=DEFAULT_FILENAME, negative_ttl=NEGATIVE_TTL):
+        self.filename = filename
+        self.negative_ttl = negative_ttl
+        # sqlite connections cannot be shared between threads, and
+        # the lookups run on a thread pool.
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            dirname = os.path.dirname(os.path.abspath(self.filename))
+            if not os.path.isdir(dirname):
+                try:
+                    os.makedirs(dirname)
+                except OSError:
+                    # Another process created it first.
+                    if not os.path.isdir(dirname):
+                        raise
+            # Wait for other writers instead of failing right away.
+            conn = sqlite3.connect(self.filename, timeout=30)
+            with conn:
+                conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, kind, repo, ref):
+        """Return the cached value, or None.
+
+        Negative values older than the TTL are treated as missing.
+
+        """
+        row = self._connect().execute(
+            'SELECT value, positive, checked FROM facts '
+            'WHERE kind = ? AND repo = ? AND ref = ?',
+            (kind, repo, str(ref)),
+        ).fetchone()
+        if row is None:
+            return None
+        value, positive, checked = row
+        if not positive and checked + self.negative_ttl < time.time():
+            return None
+        return value
+
+    def set(self, kind, repo, ref, value, positive):
+        "Store value, which is kept forever if positive is true."
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO facts '
+                '(kind, repo, ref, value, positive, checked) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (kind, repo, str(ref), value, int(bool(positive)),
+                 time.time()),
+            )
+
+    def prune(self, everything=False):
+        """Remove expired negative entries and return how many went.
+
+        :param everything: Remove positive entries as well.
+
+        """
+        conn = self._connect()
+        with conn:
+            if everything:
+                cursor = conn.execute('DELETE FROM facts')
+            else:
+                cursor = conn.execute(
+                    'DELETE FROM facts WHERE positive = 0 AND checked < ?',
+                    (time.time() - self.negative_ttl,),
+                )
+        return cursor.rowcount
+
+
+_lock = threading.Lock()
+_enabled = True
+_cache = None
+
+
+def disable():
+    "Stop using the cache for the rest of the process."
+    global _enabled
+    _enabled = False
+
+
+def get_cache():
+    "Return the shared cache, or None if it is disabled."
+    global _cache
+    if not _enabled:
+        return None
+    with _lock:
+        if _cache is None:
+            _cache = GitFactCache()
+        return _cache
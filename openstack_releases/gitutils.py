@@ -12,19 +12,44 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import atexit
+import collections
+import multiprocessing.pool
 import os
 import os.path
 import subprocess
-
-import requests
+import threading
 
 # Disable warnings about insecure connections.
 from requests.packages import urllib3
+
+from openstack_releases import gitcache
+from openstack_releases import httputils
+from openstack_releases import mirrors
+
 urllib3.disable_warnings()
 
 CGIT_SHA_TEMPLATE = 'http://git.openstack.org/cgit/%s/commit/?id=%s'
 CGIT_TAG_TEMPLATE = 'http://git.openstack.org/cgit/%s/tag/?h=%s'
 
+# Base location of the repositories, for commands that talk to git
+# directly. May also be the path to a local directory of mirrors.
+GIT_REMOTE = os.environ.get('RELEASES_GIT_REMOTE', 'git://git.openstack.org')
+
+# Kinds of reference understood by refs_exist().
+COMMIT = 'commit'
+TAG = 'tag'
+
+_TEMPLATES = {
+    COMMIT: CGIT_SHA_TEMPLATE,
+    TAG: CGIT_TAG_TEMPLATE,
+}
+
+_FACTS = {
+    COMMIT: gitcache.COMMIT_EXISTS,
+    TAG: gitcache.TAG_EXISTS,
+}
+
 
 def find_modified_deliverable_files():
     "Return a list of files modified by the most recent commit."
@@ -47,12 +72,7 @@ def commit_exists(repo, ref):
     someone to fool the check.
 
     """
-    url = CGIT_SHA_TEMPLATE % (repo, ref)
-    response = requests.get(url)
-    missing_commit = (
-        (response.status_code // 100 != 2) or 'Bad object id' in response.text
-    )
-    return not missing_commit
+    return _ref_exists(COMMIT, repo, ref)
 
 
 def tag_exists(repo, ref):
@@ -63,28 +83,192 @@ def tag_exists(repo, ref):
     someone to fool the check.
 
     """
-    url = CGIT_TAG_TEMPLATE % (repo, ref)
-    response = requests.get(url)
+    return _ref_exists(TAG, repo, ref)
+
+
+def _ref_exists(kind, repo, ref):
+    facts = gitcache.get_cache()
+    if facts is not None:
+        cached = facts.get(_FACTS[kind], repo, ref)
+        if cached is not None:
+            return cached == 'yes'
+    url = _TEMPLATES[kind] % (repo, ref)
+    response = httputils.get(url)
     missing_commit = (
         (response.status_code // 100 != 2) or 'Bad object id' in response.text
     )
+    # Do not remember server errors, they say nothing about the
+    # repository.
+    if facts is not None and response.status_code // 100 != 5:
+        facts.set(_FACTS[kind], repo, ref,
+                  'no' if missing_commit else 'yes',
+                  not missing_commit)
     return not missing_commit
 
 
-def clone_repo(workdir, repo):
-    "Check out the code."
+def _check_query(query):
+    repo, ref, kind = query
+    return _ref_exists(kind, repo, ref)
+
+
+def refs_exist(queries, workers=httputils.POOL_SIZE):
+    """Check whether several references exist, concurrently.
+
+    Returns a list of booleans in the same order as queries. Repeated
+    queries are only sent once.
+
+    :param queries: Sequence of (repo, ref, kind) tuples, where kind
+        is :data:`COMMIT` or :data:`TAG`.
+    :param workers: The maximum number of lookups to run at the same
+        time.
+
+    """
+    queries = list(queries)
+    unique = list(collections.OrderedDict.fromkeys(queries))
+    if not unique:
+        return []
+    found = _map_concurrently(_check_query, unique, workers)
+    results = dict(zip(unique, found))
+    return [results[q] for q in queries]
+
+
+def _map_concurrently(func, items, workers):
+    workers = max(1, min(workers, len(items)))
+    if workers == 1:
+        return [func(i) for i in items]
+    pool = multiprocessing.pool.ThreadPool(workers)
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def remote_url(repo, remote=GIT_REMOTE):
+    """Return the location of repo under remote.
+
+    For a local mirror directory, a bare repository named with a
+    ``.git`` suffix is used if there is no plain one.
+
+    """
+    url = '%s/%s' % (remote.rstrip('/'), repo)
+    if (os.path.isdir(remote) and not os.path.exists(url) and
+            os.path.exists(url + '.git')):
+        url += '.git'
+    return url
+
+
+def get_remote_tags(repo, remote=GIT_REMOTE):
+    """Return the set of tag names in the repository.
+
+    Runs ``git ls-remote --tags`` against the repository under
+    remote, so nothing is cloned. Returns None if the tags cannot be
+    listed.
+
+    """
+    try:
+        output = subprocess.check_output(
+            ['git', 'ls-remote', '--tags', remote_url(repo, remote)],
+            stderr=subprocess.STDOUT,
+        ).decode('utf-8')
+    except subprocess.CalledProcessError as e:
+        print('ERROR listing tags for %s: %s [%s]' %
+              (repo, e, e.output.strip()))
+        return None
+    tags = set()
+    for line in output.splitlines():
+        ref = line.partition('\t')[-1]
+        if not ref.startswith('refs/tags/'):
+            continue
+        # Annotated tags are listed a second time with the suffix
+        # ^{} for the commit they point to.
+        if ref.endswith('^{}'):
+            ref = ref[:-3]
+        tags.add(ref[len('refs/tags/'):])
+    return tags
+
+
+def get_remote_tags_for_repos(repos, remote=GIT_REMOTE,
+                              workers=httputils.POOL_SIZE):
+    """Return a dict mapping each repository to its set of tags.
+
+    The repositories are listed concurrently. Repositories whose tags
+    could not be listed map to None.
+
+    """
+    repos = sorted(set(repos))
+    found = _map_concurrently(
+        lambda repo: get_remote_tags(repo, remote),
+        repos,
+        workers,
+    )
+    return dict(zip(repos, found))
+
+
+def clone_repo(workdir, repo, branch=None, history_only=False):
+    """Check out the code.
+
+    The working copy is made from the local mirror pool when it is
+    enabled (see :mod:`openstack_releases.mirrors`), and with
+    zuul-cloner otherwise.
+
+    :param branch: Branch to check out. If the repository was already
+        cloned into workdir, it is fetched again and switched to this
+        branch.
+    :param history_only: Boolean indicating that the caller only
+        looks at refs and commits. The clone then has no files
+        checked out, and when it is not made from the mirror pool
+        file contents are only downloaded if something reads them.
+
+    """
     dest = os.path.join(workdir, repo)
+    cache_dir = os.environ.get('ZUUL_CACHE_DIR', '/opt/git')
+    pool = mirrors.get_pool()
     if os.path.exists(dest):
+        if branch:
+            if pool is not None:
+                # The working copy fetches from the mirror, so bring
+                # that up to date first.
+                pool.update(repo, remote_url(repo))
+            _switch_branch(dest, branch)
+            forget_ref_snapshot(workdir, repo)
+        return
+    if pool is not None:
+        seed = None
+        if cache_dir and os.path.isdir(os.path.join(cache_dir, repo)):
+            seed = os.path.join(cache_dir, repo)
+        print('Cloning %s from the mirror pool into %s' % (repo, dest))
+        pool.clone(repo, remote_url(repo), dest, branch=branch, seed=seed,
+                   checkout=not history_only)
+        forget_ref_snapshot(workdir, repo)
+        return
+    if history_only:
+        # zuul-cloner always checks out a tree, so use a partial
+        # clone instead. Servers that do not support filters send
+        # everything, which still works.
+        print('Cloning history of %s into %s' % (repo, dest))
+        cmd = ['git', 'clone', '--quiet', '--no-checkout',
+               '--filter=blob:none']
+        if branch:
+            cmd.extend(['--branch', branch])
+        if cache_dir and os.path.isdir(os.path.join(cache_dir, repo)):
+            # Borrow the objects already in the zuul cache, as
+            # zuul-cloner does, so only new ones are downloaded.
+            cmd.extend(['--reference-if-able',
+                        os.path.join(cache_dir, repo)])
+        subprocess.check_call(cmd + [remote_url(repo), dest])
+        forget_ref_snapshot(workdir, repo)
         return
     cmd = [
         'zuul-cloner',
         '--workspace', workdir,
     ]
-    cache_dir = os.environ.get('ZUUL_CACHE_DIR', '/opt/git')
+    if branch:
+        cmd.extend(['--branch', branch])
     if cache_dir and os.path.exists(cache_dir):
         cmd.extend(['--cache-dir', cache_dir])
     cmd.extend([
-        'git://git.openstack.org',
+        GIT_REMOTE,
         repo,
     ])
     subprocess.check_call(cmd)
@@ -95,28 +279,560 @@ def clone_repo(workdir, repo):
         ['git', 'fetch', '-v', '--tags'],
         cwd=dest,
     )
+    forget_ref_snapshot(workdir, repo)
+
+
+def _switch_branch(dest, branch):
+    """Fetch and make branch the current branch of an existing clone.
+
+    Like zuul-cloner, falls back to the default branch of the remote
+    if it does not have the one asked for.
+
+    """
+    print('Updating %s and switching to %s' % (dest, branch))
+    subprocess.check_call(['git', 'fetch', '--quiet', '--tags', 'origin'],
+                          cwd=dest)
+    start = 'origin/%s' % branch
+    with open(os.devnull, 'w') as devnull:
+        if subprocess.call(['git', 'rev-parse', '--verify', '--quiet',
+                            'refs/remotes/' + start],
+                           cwd=dest, stdout=devnull) != 0:
+            start = subprocess.check_output(
+                ['git', 'rev-parse', '--abbrev-ref', 'origin/HEAD'],
+                cwd=dest,
+            ).decode('utf-8').strip()
+            print('WARNING: %s has no branch %s, using %s' %
+                  (dest, branch, start))
+            branch = start[len('origin/'):]
+    if os.path.exists(os.path.join(dest, '.git', 'index')):
+        subprocess.check_call(
+            ['git', 'checkout', '--quiet', '-B', branch, start],
+            cwd=dest,
+        )
+    else:
+        # Clones made for history only have no files to update.
+        subprocess.check_call(
+            ['git', 'update-ref', 'refs/heads/' + branch, start],
+            cwd=dest,
+        )
+        subprocess.check_call(
+            ['git', 'symbolic-ref', 'HEAD', 'refs/heads/' + branch],
+            cwd=dest,
+        )
+
+
+DEFAULT_CLONE_WORKERS = int(os.environ.get('RELEASES_CLONE_WORKERS', 4))
+
+
+class RepoCloner(object):
+    """Clone a list of repositories in the background.
+
+    Cloning starts as soon as the object is created, with up to
+    workers repositories at a time. Use :meth:`wait` to block until a
+    particular repository is ready, so work on it can start while the
+    others are still being cloned. A failure is recorded for the
+    repository it happened in and does not stop the others.
+
+    :param progress: Optional callable invoked with the repository
+        name and the error (or None) as each clone finishes.
+    :param history_only: Passed to :func:`clone_repo`.
+
+    """
+
+    def __init__(self, workdir, repos, workers=DEFAULT_CLONE_WORKERS,
+                 progress=None, history_only=False):
+        self.workdir = workdir
+        self.history_only = history_only
+        self.repos = list(collections.OrderedDict.fromkeys(repos))
+        self._progress = progress
+        self._lock = threading.Lock()
+        self._pool = multiprocessing.pool.ThreadPool(
+            max(1, min(workers, len(self.repos))))
+        self._results = {
+            repo: self._pool.apply_async(self._clone, (repo,))
+            for repo in self.repos
+        }
+        self._pool.close()
+
+    def _clone(self, repo):
+        try:
+            clone_repo(self.workdir, repo, history_only=self.history_only)
+            error = None
+        except Exception as e:
+            print('ERROR cloning %s: %s' % (repo, e))
+            error = e
+        if self._progress is not None:
+            with self._lock:
+                self._progress(repo, error)
+        return error
+
+    def wait(self, repo):
+        """Block until repo is cloned.
+
+        Returns None on success, or the exception raised while
+        cloning it.
+
+        """
+        try:
+            result = self._results[repo]
+        except KeyError:
+            raise ValueError('%s is not one of the repositories '
+                             'being cloned' % repo)
+        return result.get()
+
+    def wait_all(self):
+        """Block until every repository is cloned.
+
+        Returns a dict mapping the repositories that failed to the
+        exceptions raised.
+
+        """
+        self._pool.join()
+        return {
+            repo: error
+            for repo, error in ((r, self.wait(r)) for r in self.repos)
+            if error is not None
+        }
+
+
+class ObjectReader(object):
+    """Look up objects in one repository through long-running processes.
+
+    Starting git for every lookup dominates the cost of checking a
+    deliverable with many releases, so the reader keeps a ``git
+    cat-file --batch-check`` process open for resolving names, and
+    starts a ``git cat-file --batch`` process the first time object
+    content is needed. Use :func:`get_object_reader` to share readers.
+
+    """
+
+    def __init__(self, repo_dir):
+        self.repo_dir = repo_dir
+        self._procs = {}
+        self._lock = threading.Lock()
+
+    def _proc(self, mode):
+        proc = self._procs.get(mode)
+        if proc is None:
+            with open(os.devnull, 'wb') as devnull:
+                proc = subprocess.Popen(
+                    ['git', 'cat-file', mode],
+                    cwd=self.repo_dir,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=devnull,
+                )
+            self._procs[mode] = proc
+        return proc
+
+    def _request(self, mode, name):
+        # Names are read one per line, so a newline would desynchronize
+        # the output from the requests.
+        if '\n' in name:
+            raise ValueError('invalid object name %r' % name)
+        proc = self._proc(mode)
+        try:
+            proc.stdin.write(name.encode('utf-8') + b'\n')
+            proc.stdin.flush()
+        except (IOError, OSError):
+            raise RuntimeError('git cat-file exited in %s' % self.repo_dir)
+        header = proc.stdout.readline().decode('utf-8').rstrip('\n')
+        if not header:
+            raise RuntimeError('git cat-file exited in %s' % self.repo_dir)
+        parts = header.split(' ')
+        if parts[-1] in ('missing', 'ambiguous'):
+            # "<name> missing" or "<name> ambiguous", where the name
+            # may itself contain spaces.
+            return None
+        if len(parts) != 3:
+            raise RuntimeError('unexpected output from git cat-file in %s: '
+                               '%r' % (self.repo_dir, header))
+        return parts[0], parts[1], int(parts[2])
+
+    def resolve(self, name, peel=None):
+        """Return the SHA of the object name refers to, or None.
+
+        :param peel: Optional object type, such as 'commit', to
+            dereference tags down to.
+
+        """
+        if peel:
+            name = '%s^{%s}' % (name, peel)
+        with self._lock:
+            info = self._request('--batch-check', name)
+        return info[0] if info else None
+
+    def exists(self, name):
+        "Return boolean indicating whether the object exists."
+        return self.resolve(name) is not None
+
+    def read(self, name):
+        """Return a tuple with the SHA, type, and content of an object.
+
+        Returns None if the object does not exist.
+
+        """
+        with self._lock:
+            info = self._request('--batch', name)
+            if info is None:
+                return None
+            proc = self._procs['--batch']
+            content = proc.stdout.read(info[2])
+            # Skip the newline following the content.
+            proc.stdout.read(1)
+        return info[0], info[1], content
+
+    def close(self):
+        with self._lock:
+            for proc in self._procs.values():
+                proc.stdin.close()
+                proc.wait()
+                proc.stdout.close()
+            self._procs = {}
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def get_object_reader(workdir, repo):
+    "Return the shared :class:`ObjectReader` for a cloned repository."
+    repo_dir = os.path.join(workdir, repo)
+    with _readers_lock:
+        reader = _readers.get(repo_dir)
+        if reader is None:
+            reader = _readers[repo_dir] = ObjectReader(repo_dir)
+        return reader
+
+
+@atexit.register
+def close_object_readers():
+    "Stop the processes of all shared object readers."
+    with _readers_lock:
+        for reader in _readers.values():
+            reader.close()
+        _readers.clear()
+
+
+class RefSnapshot(object):
+    """The branches and tags of a repository, read with one git call.
+
+    Tags map to the commit they point to, with annotated tags peeled.
+    Branch names are given the way ``git branch -a`` shows them, so
+    remote branches start with ``remotes/``.
+
+    """
+
+    _FORMAT = '%(refname) %(objectname) %(*objectname) %(symref)'
+
+    def __init__(self, repo_dir):
+        self.repo_dir = repo_dir
+        self.tags = {}
+        self.branches = {}
+        # Branches that are only aliases of another, like origin/HEAD.
+        self.symbolic = set()
+        output = subprocess.check_output(
+            ['git', 'for-each-ref', '--format=' + self._FORMAT,
+             'refs/tags', 'refs/heads', 'refs/remotes'],
+            cwd=repo_dir,
+            stderr=subprocess.STDOUT,
+        ).decode('utf-8')
+        for line in output.splitlines():
+            refname, sha, peeled, symref = (line.split(' ') + ['', ''])[:4]
+            if refname.startswith('refs/tags/'):
+                self.tags[refname[len('refs/tags/'):]] = peeled or sha
+                continue
+            if refname.startswith('refs/heads/'):
+                name = refname[len('refs/heads/'):]
+            else:
+                name = refname[len('refs/'):]
+            self.branches[name] = sha
+            if symref:
+                self.symbolic.add(name)
+
+    def tag_sha(self, tag):
+        "Return the SHA of the commit tagged, or None."
+        return self.tags.get(str(tag))
+
+    def branch_head(self, branch):
+        """Return the SHA at the head of branch, or None.
+
+        Remote branches may be named with or without the ``remotes/``
+        prefix.
+
+        """
+        return (self.branches.get(branch) or
+                self.branches.get('remotes/' + branch))
+
+    def has_branch(self, branch):
+        return self.branch_head(branch) is not None
+
+
+_ref_snapshots = {}
+_ref_snapshots_lock = threading.Lock()
+
+
+def get_ref_snapshot(workdir, repo):
+    """Return the :class:`RefSnapshot` for a cloned repository.
+
+    The snapshot is built the first time it is requested and reused
+    until the repository is fetched again by :func:`clone_repo`.
+    Returns None if the refs cannot be read.
+
+    """
+    repo_dir = os.path.join(workdir, repo)
+    with _ref_snapshots_lock:
+        refs = _ref_snapshots.get(repo_dir)
+        if refs is None:
+            try:
+                refs = RefSnapshot(repo_dir)
+            except (OSError, subprocess.CalledProcessError) as e:
+                print('ERROR reading refs of %s: %s' % (repo_dir, e))
+                return None
+            _ref_snapshots[repo_dir] = refs
+        return refs
+
+
+def forget_ref_snapshot(workdir, repo):
+    """Discard the saved refs and ancestry of a repository after it changes.
+
+    The shared object reader is stopped too, so names such as HEAD are
+    resolved again.
+
+    """
+    repo_dir = os.path.join(workdir, repo)
+    with _ref_snapshots_lock:
+        _ref_snapshots.pop(repo_dir, None)
+    with _readers_lock:
+        reader = _readers.pop(repo_dir, None)
+    if reader is not None:
+        reader.close()
+    with _ancestry_lock:
+        _ancestry.pop(repo_dir, None)
+
+
+class AncestryIndex(object):
+    """Answer ancestry questions about a repository in memory.
+
+    The parents of every commit reachable from a ref are read with one
+    git call, after writing a commit-graph file so git can list them
+    without parsing each commit. Each commit is given a generation
+    number (one more than the highest of its parents), which lets a
+    search for an ancestor stop at commits that are too old to lead
+    to it. Commits that are not reachable from any ref are checked
+    with ``git merge-base --is-ancestor`` instead.
+
+    Use :func:`get_ancestry_index` to share indexes.
+
+    """
+
+    def __init__(self, workdir, repo):
+        self.workdir = workdir
+        self.repo = repo
+        self.repo_dir = os.path.join(workdir, repo)
+        with open(os.devnull, 'wb') as devnull:
+            try:
+                # Needs git 2.18 or later, but only speeds up the
+                # rev-list call below.
+                subprocess.check_call(
+                    ['git', 'commit-graph', 'write', '--reachable'],
+                    cwd=self.repo_dir,
+                    stdout=devnull,
+                    stderr=devnull,
+                )
+            except subprocess.CalledProcessError:
+                pass
+        output = subprocess.check_output(
+            ['git', 'rev-list', '--all', '--topo-order', '--parents'],
+            cwd=self.repo_dir,
+        ).decode('ascii')
+        self._parents = {}
+        order = []
+        for line in output.splitlines():
+            shas = line.split()
+            self._parents[shas[0]] = shas[1:]
+            order.append(shas[0])
+        # Topological order lists children before their parents.
+        self._generation = {}
+        for sha in reversed(order):
+            self._generation[sha] = 1 + max(
+                [self._generation[p] for p in self._parents[sha]] or [0]
+            )
+        self._children = None
+
+    def resolve(self, name):
+        "Return the SHA of the commit name refers to, or None."
+        name = str(name)
+        if name in self._parents:
+            return name
+        refs = get_ref_snapshot(self.workdir, self.repo)
+        sha = refs.tag_sha(name) if refs is not None else None
+        if sha:
+            return sha
+        return get_object_reader(self.workdir, self.repo).resolve(
+            name, peel='commit')
+
+    def _is_ancestor(self, ancestor, descendant):
+        if ancestor == descendant:
+            return True
+        if ancestor not in self._parents or descendant not in self._parents:
+            return subprocess.call(
+                ['git', 'merge-base', '--is-ancestor', ancestor, descendant],
+                cwd=self.repo_dir,
+            ) == 0
+        min_generation = self._generation[ancestor]
+        seen = set()
+        todo = [descendant]
+        while todo:
+            sha = todo.pop()
+            for parent in self._parents[sha]:
+                if parent == ancestor:
+                    return True
+                if (parent not in seen and
+                        self._generation[parent] > min_generation):
+                    seen.add(parent)
+                    todo.append(parent)
+        return False
+
+    def is_ancestor(self, ancestor, descendant):
+        """Return boolean indicating whether ancestor is in the history
+        of descendant.
+
+        Like ``git merge-base --is-ancestor``, a commit counts as its
+        own ancestor. Raises ValueError if either name cannot be
+        resolved.
+
+        """
+        old = self.resolve(ancestor)
+        new = self.resolve(descendant)
+        for name, sha in ((ancestor, old), (descendant, new)):
+            if sha is None:
+                raise ValueError('cannot find commit %r in %s' %
+                                 (name, self.repo_dir))
+        return self._is_ancestor(old, new)
+
+    def is_ancestor_many(self, pairs):
+        "Return a list with the result of is_ancestor() for each pair."
+        return [self.is_ancestor(a, d) for a, d in pairs]
+
+    def _descendants(self, sha):
+        if self._children is None:
+            self._children = collections.defaultdict(list)
+            for child, parents in self._parents.items():
+                for parent in parents:
+                    self._children[parent].append(child)
+        found = set([sha])
+        todo = [sha]
+        while todo:
+            for child in self._children.get(todo.pop(), []):
+                if child not in found:
+                    found.add(child)
+                    todo.append(child)
+        return found
+
+    def _containing(self, name, refs):
+        sha = self.resolve(name)
+        if sha is None:
+            raise ValueError('cannot find commit %r in %s' %
+                             (name, self.repo_dir))
+        if sha not in self._parents:
+            return sorted(r for r, head in refs.items()
+                          if self._is_ancestor(sha, head))
+        descendants = self._descendants(sha)
+        return sorted(r for r, head in refs.items() if head in descendants)
+
+    def branches_containing(self, name, remote_only=False):
+        """Return the branches whose history includes the commit.
+
+        Branch names are spelled as in :class:`RefSnapshot`, and
+        aliases such as ``remotes/origin/HEAD`` are left out.
+
+        """
+        snapshot = get_ref_snapshot(self.workdir, self.repo)
+        if snapshot is None:
+            return []
+        refs = {
+            b: head for b, head in snapshot.branches.items()
+            if b not in snapshot.symbolic and
+            (b.startswith('remotes/') or not remote_only)
+        }
+        return self._containing(name, refs)
+
+    def tags_containing(self, name):
+        "Return the tags whose history includes the commit."
+        snapshot = get_ref_snapshot(self.workdir, self.repo)
+        if snapshot is None:
+            return []
+        return self._containing(name, snapshot.tags)
+
+
+_ancestry = {}
+_ancestry_lock = threading.Lock()
+
+
+def get_ancestry_index(workdir, repo):
+    """Return the :class:`AncestryIndex` for a cloned repository.
+
+    The index is built the first time it is requested and reused
+    until the repository is fetched again by :func:`clone_repo`.
+    Returns None if the history cannot be read.
+
+    """
+    repo_dir = os.path.join(workdir, repo)
+    with _ancestry_lock:
+        index = _ancestry.get(repo_dir)
+        if index is None:
+            try:
+                index = AncestryIndex(workdir, repo)
+            except (OSError, subprocess.CalledProcessError) as e:
+                print('ERROR reading history of %s: %s' % (repo_dir, e))
+                return None
+            _ancestry[repo_dir] = index
+        return index
 
 
 def sha_for_tag(workdir, repo, version):
     """Return the SHA for a given tag
+
+    Also accepts branch names, HEAD, and SHAs.
+
     """
-    # git log 2.3.11 -n 1 --pretty=format:%H
+    refs = get_ref_snapshot(workdir, repo)
+    actual_sha = refs.tag_sha(version) if refs is not None else None
+    if actual_sha:
+        return actual_sha
+    # Same answer as "git log 2.3.11 -n 1 --pretty=format:%H", without
+    # starting a new process.
+    reader = get_object_reader(workdir, repo)
     try:
-        actual_sha = subprocess.check_output(
-            ['git', 'log', str(version), '-n', '1', '--pretty=format:%H'],
-            cwd=os.path.join(workdir, repo),
-            stderr=subprocess.STDOUT,
-        )
-        actual_sha = actual_sha.strip()
-    except subprocess.CalledProcessError as e:
-        print('ERROR getting SHA for tag %r: %s [%s]' %
-              (version, e, e.output.strip()))
+        actual_sha = reader.resolve(str(version), peel='commit')
+    except (OSError, RuntimeError) as e:
+        print('ERROR getting SHA for tag %r: %s' % (version, e))
         actual_sha = ''
+    else:
+        if actual_sha is None:
+            print('ERROR getting SHA for tag %r: not found in %s' %
+                  (version, reader.repo_dir))
+            actual_sha = ''
     return actual_sha
 
 
 def check_ancestry(workdir, repo, old_version, sha):
     "Check if the SHA is in the ancestry of the previous version."
+    index = get_ancestry_index(workdir, repo)
+    if index is not None:
+        # Same answer as a non-empty "git log --ancestry-path old..sha",
+        # without listing the commits in between.
+        try:
+            old_sha = index.resolve(old_version)
+            new_sha = index.resolve(sha)
+            if old_sha is None or new_sha is None:
+                raise ValueError('cannot find %r or %r' % (old_version, sha))
+            return (old_sha != new_sha and
+                    index.is_ancestor(old_sha, new_sha))
+        except (OSError, RuntimeError, ValueError) as e:
+            print('ERROR checking ancestry: %s' % e)
+            return False
     try:
         ancestors = subprocess.check_output(
             ['git', 'log', '--oneline', '--ancestry-path',
@@ -146,6 +862,9 @@ def get_latest_tag(workdir, repo, sha=None):
 
 
 def get_branches(workdir, repo):
+    refs = get_ref_snapshot(workdir, repo)
+    if refs is not None:
+        return sorted(refs.branches)
     try:
         output = subprocess.check_output(
             ['git', 'branch', '-a'],
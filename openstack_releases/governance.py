@@ -13,12 +13,16 @@
 """Work with the governance repository.
 """
 
-import weakref
+import collections
+import os
 
-import requests
-import yaml
+from openstack_releases import sources
+from openstack_releases import yamlutils
 
-PROJECTS_LIST = "http://git.openstack.org/cgit/openstack/governance/plain/reference/projects.yaml"  # noqa
+PROJECTS_LIST = os.environ.get(
+    'RELEASES_GOVERNANCE_PROJECTS',
+    "http://git.openstack.org/cgit/openstack/governance/plain/reference/projects.yaml",  # noqa
+)
 
 
 def get_team_data(url=PROJECTS_LIST):
@@ -26,28 +30,34 @@ def get_team_data(url=PROJECTS_LIST):
 
     :param url: Optional URL to the location of the projects.yaml
         file. Defaults to the most current version in the public git
-        repository.
+        repository. May also be the path to a local copy of the file,
+        to a checkout of the governance repository, or a repository
+        and ref given as ``PATH@REF`` (see :mod:`sources`).
 
     """
-    r = requests.get(url)
-    return yaml.load(r.text)
+    return sources.load(url, yamlutils.load,
+                        local_name='reference/projects.yaml')
 
 
 def get_repo_owner(team_data, repo_name):
     """Return the name of the team that owns the repository.
 
-    :param team_data: The result of calling :func:`get_team_data`
+    :param team_data: The result of calling :func:`get_team_data`, or
+        a :class:`GovernanceIndex` built from it.
     :param repo_name: Long name of the repository, such as 'openstack/nova'.
 
     """
-    for team, info in team_data.items():
-        for dname, dinfo in info.get('deliverables', {}).items():
-            if repo_name in dinfo.get('repos', []):
-                return team
-    raise ValueError('Repository %s not found in governance list' % repo_name)
+    try:
+        return _get_index(team_data).repo_owner[repo_name]
+    except KeyError:
+        raise ValueError('Repository %s not found in governance list' %
+                         repo_name)
 
 
 class Team(object):
+
+    __slots__ = ('name', 'data', 'ptl', 'tags', 'deliverables')
+
     def __init__(self, name, data):
         self.name = name
         self.data = data
@@ -59,58 +69,130 @@ class Team(object):
             'irc': 'MISSING',
         }
         self.ptl.update(data.get('ptl', {}))
+        self.tags = frozenset(data.get('tags', []))
         self.deliverables = {
             dn: Deliverable(dn, di, self)
             for dn, di in self.data.get('deliverables', {}).items()
         }
 
-    @property
-    def tags(self):
-        return set(self.data.get('tags', []))
-
 
 class Deliverable(object):
+
+    __slots__ = ('name', 'data', 'team', 'tags', 'type', 'repositories')
+
     def __init__(self, name, data, team):
         self.name = name
         self.data = data
-        self.team = weakref.proxy(team)
+        self.team = team
+        # The tags set on the team apply to all of its deliverables.
+        self.tags = frozenset(data.get('tags', [])).union(team.tags)
+        self.type = 'unknown'
+        for t in sorted(self.tags):
+            if t.startswith('type:'):
+                self.type = t.partition(':')[-1]
+                break
         self.repositories = {
             rn: Repository(rn, self)
             for rn in self.data.get('repos', [])
         }
 
-    @property
-    def type(self):
-        for t in self.tags:
-            if t.startswith('type:'):
-                return t.partition(':')[-1]
-        return 'unknown'
 
-    @property
-    def tags(self):
-        return set(self.data.get('tags', [])).union(self.team.tags)
+class Repository(object):
 
+    __slots__ = ('name', 'deliverable', 'tags', 'code_related')
 
-class Repository(object):
     def __init__(self, name, deliverable):
         self.name = name
-        self.deliverable = weakref.proxy(deliverable)
+        self.deliverable = deliverable
+        self.tags = deliverable.tags
+        self.code_related = not (name.endswith('-specs') or
+                                 'cookiecutter' in name)
 
-    @property
-    def tags(self):
-        return self.deliverable.tags
 
-    @property
-    def code_related(self):
-        return not (self.name.endswith('-specs') or
-                    'cookiecutter' in self.name)
+class GovernanceIndex(object):
+    """Lookup tables built once from the governance team data.
+
+    :param team_data: The result of calling :func:`get_team_data`.
+
+    """
+
+    def __init__(self, team_data):
+        self.team_data = team_data
+        self.teams = collections.OrderedDict(
+            (n, Team(n, i)) for n, i in team_data.items()
+        )
+        # Every repository, in the order of the team data, so results
+        # come out in the same order as when scanning the data.
+        self.repositories = []
+        # Long repository name to the name of the first team listing it.
+        self.repo_owner = {}
+        # Team name to its repositories.
+        self.team_repos = {}
+        # Deliverable name to the repositories of every deliverable
+        # with that name.
+        self.deliverable_repos = collections.defaultdict(set)
+        # Tag to the repositories having it, counting tags set on the
+        # team or the deliverable.
+        self.tag_repos = collections.defaultdict(set)
+        for team in self.teams.values():
+            self.team_repos[team.name] = set()
+            for deliverable in team.deliverables.values():
+                for repository in deliverable.repositories.values():
+                    self.repositories.append(repository)
+                    self.repo_owner.setdefault(repository.name, team.name)
+                    self.team_repos[team.name].add(repository)
+                    self.deliverable_repos[deliverable.name].add(repository)
+                    for tag in repository.tags:
+                        self.tag_repos[tag].add(repository)
+
+    def get_repositories(self, team_name=None, deliverable_name=None,
+                         tags=[], code_only=False):
+        "See :func:`get_repositories`."
+        selected = None
+
+        def narrow(candidates):
+            if selected is None:
+                return set(candidates)
+            return selected.intersection(candidates)
+
+        if team_name:
+            if team_name not in self.team_repos:
+                raise RuntimeError('No team %r found in %r' %
+                                   (team_name, list(self.team_data.keys())))
+            selected = narrow(self.team_repos[team_name])
+        if deliverable_name:
+            selected = narrow(self.deliverable_repos.get(deliverable_name, ()))
+        for tag in set(tags):
+            selected = narrow(self.tag_repos.get(tag, ()))
+        return [
+            r for r in self.repositories
+            if (selected is None or r in selected) and
+            (r.code_related or not code_only)
+        ]
+
+
+# The index for the team data most recently passed to one of the
+# module functions, so callers that pass the same dict repeatedly
+# only build it once.
+_last_index = None
+
+
+def _get_index(team_data):
+    global _last_index
+    if isinstance(team_data, GovernanceIndex):
+        return team_data
+    index = _last_index
+    if index is None or index.team_data is not team_data:
+        index = _last_index = GovernanceIndex(team_data)
+    return index
 
 
 def get_repositories(team_data, team_name=None, deliverable_name=None,
                      tags=[], code_only=False):
     """Return a sequence of repositories, possibly filtered.
 
-    :param team_data: The result of calling :func:`get_team_data`
+    :param team_data: The result of calling :func:`get_team_data`, or
+        a :class:`GovernanceIndex` built from it.
     :param team_name: The name of the team owning the repositories. Can be
         None.
     :para deliverable_name: The name of the deliverable to which all
@@ -121,27 +203,9 @@ def get_repositories(team_data, team_name=None, deliverable_name=None,
       repositories (ignoring specs and cookiecutter templates).
 
     """
-    if tags:
-        tags = set(tags)
-    if team_name:
-        try:
-            teams = [Team(team_name, team_data[team_name])]
-        except KeyError:
-            raise RuntimeError('No team %r found in %r' %
-                               (team_name, list(team_data.keys())))
-    else:
-        teams = [Team(n, i) for n, i in team_data.items()]
-    for team in teams:
-        if deliverable_name and deliverable_name not in team.deliverables:
-            continue
-        if deliverable_name:
-            deliverables = [team.deliverables[deliverable_name]]
-        else:
-            deliverables = team.deliverables.values()
-        for deliverable in deliverables:
-            for repository in deliverable.repositories.values():
-                if tags and not tags.issubset(repository.tags):
-                    continue
-                if code_only and not repository.code_related:
-                    continue
-                yield repository
+    return iter(_get_index(team_data).get_repositories(
+        team_name=team_name,
+        deliverable_name=deliverable_name,
+        tags=tags,
+        code_only=code_only,
+    ))
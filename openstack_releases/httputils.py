@@ -0,0 +1,284 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Shared HTTP session for remote lookups.
+
+All of the tools talk to the same few hosts (cgit, launchpad, the
+docs server) over and over. Going through one session keeps
+connections to each host open between requests, applies a timeout to
+every request, and retries transient failures with a backoff instead
+of reporting them as missing data.
+
+The defaults can be changed through the environment:
+
+``RELEASES_HTTP_TIMEOUT``
+  Seconds to wait for the server to respond (default 30).
+``RELEASES_HTTP_RETRIES``
+  Number of times to retry a failed request (default 3).
+``RELEASES_OFFLINE``
+  Set to 1 to make :func:`get_document` use cached copies without
+  contacting the server.
+
+"""
+
+from __future__ import print_function
+
+import collections
+import hashlib
+import os
+import os.path
+import tempfile
+import threading
+
+import requests
+from requests import adapters
+from requests.packages.urllib3.util import retry
+from six.moves import cPickle as pickle
+from six.moves.urllib import parse
+
+from openstack_releases import cache
+
+DEFAULT_TIMEOUT = float(os.environ.get('RELEASES_HTTP_TIMEOUT', 30))
+DEFAULT_RETRIES = int(os.environ.get('RELEASES_HTTP_RETRIES', 3))
+
+# Connections kept open to each host. Parallel callers beyond this
+# number still work, but their extra connections are not reused.
+POOL_SIZE = 10
+
+# Responses that indicate an overloaded or restarting server rather
+# than a real answer.
+_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# Bump this value when the layout of the document cache changes.
+DOCUMENT_CACHE_VERSION = 2
+
+_offline = os.environ.get('RELEASES_OFFLINE', '') not in ('', '0')
+
+_lock = threading.Lock()
+_session = None
+_counts = collections.Counter()
+
+
+def _make_session(retries):
+    session = requests.Session()
+    adapter = adapters.HTTPAdapter(
+        pool_connections=POOL_SIZE,
+        pool_maxsize=POOL_SIZE,
+        max_retries=retry.Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=_RETRY_STATUS,
+            # Let the caller see the status of the last attempt
+            # instead of raising an exception.
+            raise_on_status=False,
+        ),
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    "Return the shared session, creating it if needed."
+    global _session
+    with _lock:
+        if _session is None:
+            _session = _make_session(DEFAULT_RETRIES)
+        return _session
+
+
+def get(url, **kwargs):
+    """Fetch url through the shared session and return the response.
+
+    Accepts the same arguments as :func:`requests.get`. The timeout
+    defaults to ``DEFAULT_TIMEOUT``.
+
+    """
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    host = parse.urlparse(url).netloc
+    with _lock:
+        _counts[host] += 1
+    return get_session().get(url, **kwargs)
+
+
+def request_counts():
+    "Return a dict mapping each host name to the number of requests made."
+    with _lock:
+        return dict(_counts)
+
+
+def report():
+    "Print the number of requests made to each host."
+    for host, count in sorted(request_counts().items()):
+        print('[http] %s: %d requests' % (host, count))
+
+
+def set_offline(offline=True):
+    "Make :func:`get_document` stop (or resume) contacting servers."
+    global _offline
+    _offline = offline
+
+
+def is_offline():
+    return _offline
+
+
+def write_atomic(filename, data):
+    "Replace filename with data, creating its directory if needed."
+    dirname = os.path.dirname(filename)
+    if not os.path.isdir(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            # Another process created it first.
+            if not os.path.isdir(dirname):
+                raise
+    fd, tmpname = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.rename(tmpname, filename)
+    except:
+        os.unlink(tmpname)
+        raise
+
+
+def loader_name(loader):
+    "Return a name for loader that stays the same between runs."
+    return '%s.%s' % (getattr(loader, '__module__', ''),
+                      getattr(loader, '__name__', repr(loader)))
+
+
+class _DocumentCache(object):
+    """Raw body, validators, and parsed form of one URL.
+
+    The body is kept in a file of its own so the parsed form, stored
+    with pickle, can be loaded without reading it. Each loader gets
+    its own entry, since the same document may be parsed in more than
+    one way.
+
+    """
+
+    def __init__(self, cache_dir, url, loader_name):
+        key = hashlib.sha1(
+            ('%s\0%s' % (url, loader_name)).encode('utf-8')
+        ).hexdigest()
+        base = os.path.join(cache_dir, 'http', key)
+        self.url = url
+        self.loader_name = loader_name
+        self.body_file = base + '.body'
+        self.meta_file = base + '.pickle'
+
+    def load_meta(self):
+        try:
+            with open(self.meta_file, 'rb') as f:
+                meta = pickle.load(f)
+        except Exception:
+            return None
+        if (meta.get('version') != DOCUMENT_CACHE_VERSION or
+                meta.get('url') != self.url or
+                meta.get('loader') != self.loader_name):
+            return None
+        return meta
+
+    def load_body(self):
+        try:
+            with open(self.body_file, 'rb') as f:
+                return f.read().decode('utf-8')
+        except (IOError, OSError):
+            return None
+
+    def save(self, response, parsed):
+        write_atomic(self.body_file, response.content)
+        meta = {
+            'version': DOCUMENT_CACHE_VERSION,
+            'url': self.url,
+            'loader': self.loader_name,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'parsed': parsed,
+        }
+        write_atomic(self.meta_file,
+                     pickle.dumps(meta, pickle.HIGHEST_PROTOCOL))
+
+
+def get_document(location, loader, cache_dir=cache.DEFAULT_CACHE_DIR):
+    """Return loader(text) for a document, using a cached copy if possible.
+
+    A copy of each downloaded document is kept in cache_dir with its
+    ETag and Last-Modified headers, and the next request asks the
+    server to send the document only if it changed. When the server
+    answers 304 Not Modified the parsed form saved with the copy is
+    returned without parsing the text again. The cached copy is also
+    used in offline mode, and if the server cannot be reached or
+    returns an error.
+
+    Use :func:`sources.load` to read documents that may also be
+    local files.
+
+    :param location: URL of the document.
+    :param loader: Callable that converts the text of the document to
+        the data returned. The result must be picklable.
+
+    """
+    entry = _DocumentCache(cache_dir, location, loader_name(loader))
+    meta = entry.load_meta()
+
+    def from_cache(reason):
+        if meta is not None and 'parsed' in meta:
+            print('[http] %s, using cached copy of %s' % (reason, location))
+            return meta['parsed']
+        body = entry.load_body()
+        if body is None:
+            return None
+        print('[http] %s, parsing cached copy of %s' % (reason, location))
+        return loader(body)
+
+    if _offline:
+        parsed = from_cache('offline')
+        if parsed is None:
+            raise RuntimeError('offline and there is no cached copy of %s' %
+                               location)
+        return parsed
+
+    headers = {}
+    if meta is not None and os.path.exists(entry.body_file):
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    try:
+        response = get(location, headers=headers)
+    except requests.RequestException as e:
+        parsed = from_cache('could not connect (%s)' % e)
+        if parsed is None:
+            raise
+        return parsed
+
+    if response.status_code == 304:
+        parsed = from_cache('not modified')
+        if parsed is not None:
+            return parsed
+        # The cache went away between the request and now.
+        response = get(location)
+    elif response.status_code // 100 != 2:
+        parsed = from_cache('server returned %s' % response.status_code)
+        if parsed is not None:
+            return parsed
+        return loader(response.text)
+
+    parsed = loader(response.text)
+    try:
+        entry.save(response, parsed)
+    except (IOError, OSError) as e:
+        print('[http] could not cache %s: %s' % (location, e))
+    return parsed
@@ -0,0 +1,313 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Pool of local bare mirrors to clone repositories from.
+
+Each repository is mirrored once under the pool directory and brought
+up to date with an incremental fetch the next time it is needed.
+Working copies are made with ``git clone --shared``, so they borrow
+the mirror's objects instead of copying them and take seconds to
+create, even for large repositories.
+
+Every mirror has a lock file so several processes can use the pool at
+the same time: updating or removing a mirror takes an exclusive lock,
+cloning from it takes a shared lock. When the pool grows beyond its
+disk budget, the least recently used mirrors are removed.
+
+Only branches and tags are mirrored. Servers replicated from Gerrit
+also publish every patch set under ``refs/changes``, which would make
+the mirrors many times larger.
+
+The pool is configured through the environment:
+
+``RELEASES_MIRROR_DIR``
+  Location of the pool. The pool is not used unless this is set.
+``RELEASES_MIRROR_BUDGET_MB``
+  Disk budget for the pool, in megabytes (default 10240).
+
+"""
+
+from __future__ import print_function
+
+import contextlib
+import fcntl
+import os
+import os.path
+import shutil
+import subprocess
+import threading
+import time
+
+from six.moves.urllib import parse
+
+DEFAULT_DIR = os.environ.get('RELEASES_MIRROR_DIR', '')
+DEFAULT_BUDGET = (
+    int(os.environ.get('RELEASES_MIRROR_BUDGET_MB', 10240)) * 2 ** 20
+)
+
+# Working copies made with --shared break if the mirror they borrow
+# objects from disappears, so mirrors used recently are never evicted.
+EVICTION_GRACE = 3600
+
+_LAST_USED = 'releases-last-used'
+
+_REFSPECS = [
+    '+refs/heads/*:refs/heads/*',
+    '+refs/tags/*:refs/tags/*',
+]
+
+
+@contextlib.contextmanager
+def _locked(filename, shared=False, blocking=True):
+    """Hold a lock on filename.
+
+    Yields False instead of waiting if blocking is false and someone
+    else holds a conflicting lock.
+
+    """
+    with open(filename, 'a') as f:
+        mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if not blocking:
+            mode |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(f.fileno(), mode)
+        except (IOError, OSError):
+            if blocking:
+                raise
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _dir_size(dirname):
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(dirname):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _git(*args, **kwds):
+    subprocess.check_call(('git',) + args, **kwds)
+
+
+def _fetch_refspecs(path):
+    try:
+        out = subprocess.check_output(
+            ['git', 'config', '--get-all', 'remote.origin.fetch'],
+            cwd=path,
+        )
+    except subprocess.CalledProcessError:
+        return []
+    return out.decode('utf-8').split()
+
+
+def _init_mirror(path, url):
+    _git('init', '--quiet', '--bare', path)
+    _git('remote', 'add', 'origin', url, cwd=path)
+    _git('config', '--unset-all', 'remote.origin.fetch', cwd=path)
+    for refspec in _REFSPECS:
+        _git('config', '--add', 'remote.origin.fetch', refspec, cwd=path)
+
+
+def _set_head(path, source):
+    """Point HEAD of the mirror at the default branch of source.
+
+    Working copies cloned from the mirror check out that branch when
+    they are not given one.
+
+    """
+    try:
+        out = subprocess.check_output(
+            ['git', 'ls-remote', '--symref', source, 'HEAD'],
+            cwd=path,
+        ).decode('utf-8')
+    except subprocess.CalledProcessError:
+        return
+    for line in out.splitlines():
+        if line.startswith('ref: ') and line.endswith('\tHEAD'):
+            _git('symbolic-ref', 'HEAD', line[len('ref: '):-len('\tHEAD')],
+                 cwd=path)
+            return
+
+
+class MirrorPool(object):
+    """Bare mirrors of repositories, kept under one directory."""
+
+    def __init__(self, root=DEFAULT_DIR, budget=DEFAULT_BUDGET):
+        self.root = root
+        self.budget = budget
+        self._lock_dir = os.path.join(root, '.locks')
+
+    def path(self, repo):
+        "Return the directory holding the mirror of repo."
+        return os.path.join(self.root, repo + '.git')
+
+    def _lock_file(self, repo):
+        if not os.path.isdir(self._lock_dir):
+            try:
+                os.makedirs(self._lock_dir)
+            except OSError:
+                # Another process created it first.
+                if not os.path.isdir(self._lock_dir):
+                    raise
+        return os.path.join(self._lock_dir,
+                            parse.quote(repo, safe='') + '.lock')
+
+    def update(self, repo, url, seed=None):
+        """Create or refresh the mirror of repo and return its path.
+
+        :param url: Location to fetch the repository from.
+        :param seed: Optional local copy of the repository to take
+            most of the objects from when the mirror is first made.
+
+        """
+        path = self.path(repo)
+        with _locked(self._lock_file(repo)):
+            if (os.path.isdir(path) and
+                    _fetch_refspecs(path) != _REFSPECS):
+                # Made by an older version that mirrored every ref.
+                print('[mirrors] replacing %s' % path)
+                shutil.rmtree(path)
+            if os.path.isdir(path):
+                print('[mirrors] updating %s' % path)
+                _git('fetch', '--quiet', '--prune', 'origin', cwd=path)
+            else:
+                print('[mirrors] creating %s' % path)
+                tmpname = '%s.tmp-%d' % (path, os.getpid())
+                if os.path.exists(tmpname):
+                    shutil.rmtree(tmpname)
+                try:
+                    _init_mirror(tmpname, url)
+                    if seed:
+                        _git('fetch', '--quiet', seed, *_REFSPECS,
+                             cwd=tmpname)
+                    _git('fetch', '--quiet', '--prune', 'origin',
+                         cwd=tmpname)
+                    _set_head(tmpname, 'origin')
+                    os.rename(tmpname, path)
+                except:
+                    shutil.rmtree(tmpname, ignore_errors=True)
+                    raise
+            with open(os.path.join(path, _LAST_USED), 'a'):
+                os.utime(os.path.join(path, _LAST_USED), None)
+        self.evict(keep=repo)
+        return path
+
+    def _has_branch(self, path, branch):
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.call(
+                ['git', 'rev-parse', '--verify', '--quiet',
+                 'refs/heads/%s' % branch],
+                cwd=path,
+                stdout=devnull,
+            ) == 0
+
+    def clone(self, repo, url, dest, branch=None, seed=None, checkout=True):
+        """Update the mirror of repo, then make a working copy in dest.
+
+        :param branch: Branch to check out. The default branch is used
+            if the repository does not have it.
+        :param checkout: Boolean indicating whether to check out the
+            files. Without them the copy is still fine for looking at
+            refs and history.
+
+        """
+        path = self.update(repo, url, seed)
+        with _locked(self._lock_file(repo), shared=True):
+            cmd = ['git', 'clone', '--quiet', '--shared']
+            if not checkout:
+                cmd.append('--no-checkout')
+            if branch and self._has_branch(path, branch):
+                cmd.extend(['--branch', branch])
+            cmd.extend([path, dest])
+            subprocess.check_call(cmd)
+
+    def usage(self):
+        """Return information about the mirrors in the pool.
+
+        Produces a list of (last used time, size in bytes, repo)
+        tuples, least recently used first.
+
+        """
+        results = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self.root and '.locks' in dirnames:
+                dirnames.remove('.locks')
+            for name in list(dirnames):
+                if '.git.tmp-' in name:
+                    # A mirror being created by another process.
+                    dirnames.remove(name)
+                    continue
+                if not name.endswith('.git'):
+                    continue
+                # Do not descend into the mirror itself.
+                dirnames.remove(name)
+                path = os.path.join(dirpath, name)
+                repo = os.path.relpath(path, self.root)[:-len('.git')]
+                try:
+                    last_used = os.stat(
+                        os.path.join(path, _LAST_USED)).st_mtime
+                except OSError:
+                    last_used = 0
+                results.append((last_used, _dir_size(path), repo))
+        return sorted(results)
+
+    def evict(self, budget=None, keep=None):
+        """Remove least recently used mirrors until under the budget.
+
+        Mirrors used in the last ``EVICTION_GRACE`` seconds, the one
+        named by keep, and any that another process is using are left
+        alone. Returns the names of the repositories removed.
+
+        """
+        if budget is None:
+            budget = self.budget
+        mirrors = self.usage()
+        total = sum(size for last_used, size, repo in mirrors)
+        removed = []
+        cutoff = time.time() - EVICTION_GRACE
+        for last_used, size, repo in mirrors:
+            if total <= budget:
+                break
+            if repo == keep or last_used > cutoff:
+                continue
+            with _locked(self._lock_file(repo), blocking=False) as locked:
+                if not locked:
+                    continue
+                print('[mirrors] evicting %s (%d MB)' %
+                      (repo, size // 2 ** 20))
+                shutil.rmtree(self.path(repo), ignore_errors=True)
+            total -= size
+            removed.append(repo)
+        return removed
+
+
+_lock = threading.Lock()
+_pool = None
+
+
+def get_pool():
+    "Return the shared pool, or None if it is disabled."
+    global _pool
+    if not DEFAULT_DIR:
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = MirrorPool()
+        return _pool
@@ -13,13 +13,21 @@
 """Work with the project-config repository.
 """
 
-import requests
+from __future__ import print_function
+
+import os
+
 import yaml
 
 from openstack_releases import flags
+from openstack_releases import sources
+from openstack_releases import yamlutils
 
 
-ZUUL_LAYOUT_URL = 'http://git.openstack.org/cgit/openstack-infra/project-config/plain/zuul/layout.yaml'  # noqa
+ZUUL_LAYOUT_URL = os.environ.get(
+    'RELEASES_ZUUL_LAYOUT',
+    'http://git.openstack.org/cgit/openstack-infra/project-config/plain/zuul/layout.yaml',  # noqa
+)
 ZUUL_LAYOUT_FILENAME = 'openstack-infra/project-config/zuul/layout.yaml'
 
 # We use this key to modify the data structure read from the zuul
@@ -32,11 +40,18 @@ def get_zuul_layout_data(url=ZUUL_LAYOUT_URL):
     """Return the parsed data structure for the zuul/layout.yaml file.
 
     :param url: Optional URL to the location of the file. Defaults to
-      the most current version in the public git repository.
+      the most current version in the public git repository. May also
+      be the path to a local copy of the file, to a checkout of the
+      project-config repository, or a repository and ref given as
+      ``PATH@REF`` (see :mod:`sources`).
 
     """
-    r = requests.get(url)
-    raw = yaml.safe_load(r.text)
+    return sources.load(url, _parse_zuul_layout,
+                        local_name='zuul/layout.yaml')
+
+
+def _parse_zuul_layout(text):
+    raw = yamlutils.load(text)
     # Add a mapping from repo name to repo settings, since that is how
     # we access this most often.
     raw[_VALIDATE_KEY] = {
@@ -46,6 +61,152 @@ def get_zuul_layout_data(url=ZUUL_LAYOUT_URL):
     return raw
 
 
+def get_zuul_project_templates(url=ZUUL_LAYOUT_URL):
+    """Return a dict mapping each repo in zuul/layout.yaml to its templates.
+
+    The values are frozensets of template names. Only the projects
+    section of the file is read into memory, so this is much cheaper
+    than :func:`get_zuul_layout_data` when that is all that is needed.
+
+    :param url: Optional URL to the location of the file, as for
+      :func:`get_zuul_layout_data`.
+
+    """
+    return sources.load(url, _extract_project_templates,
+                        local_name='zuul/layout.yaml')
+
+
+class _AliasFound(Exception):
+    "The projects section refers to an anchored node."
+
+
+def _check_alias(event):
+    # Resolving an alias means keeping every anchored node seen so
+    # far, so leave those files to the full loader rather than return
+    # fewer templates than it would.
+    if isinstance(event, yaml.AliasEvent):
+        raise _AliasFound()
+
+
+def _skip_node(events, event):
+    "Consume the rest of the node started by event."
+    if isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+        depth = 1
+        while depth:
+            event = next(events)
+            if isinstance(event, (yaml.MappingStartEvent,
+                                  yaml.SequenceStartEvent)):
+                depth += 1
+            elif isinstance(event, (yaml.MappingEndEvent,
+                                    yaml.SequenceEndEvent)):
+                depth -= 1
+
+
+def _iter_mapping(events):
+    """Produce (key, value event) pairs for the mapping being parsed.
+
+    Keys that are not plain scalars come back as None. The caller must
+    consume or skip each value before asking for the next pair.
+
+    """
+    while True:
+        event = next(events)
+        if isinstance(event, yaml.MappingEndEvent):
+            return
+        _check_alias(event)
+        if isinstance(event, yaml.ScalarEvent):
+            key = event.value
+        else:
+            _skip_node(events, event)
+            key = None
+        yield key, next(events)
+
+
+def _iter_sequence(events):
+    "Produce the event starting each item of the sequence being parsed."
+    while True:
+        event = next(events)
+        if isinstance(event, yaml.SequenceEndEvent):
+            return
+        yield event
+
+
+def _read_project(events):
+    name = None
+    templates = set()
+    for key, event in _iter_mapping(events):
+        if key == '<<':
+            raise _AliasFound()
+        if key == 'name':
+            _check_alias(event)
+        if key == 'name' and isinstance(event, yaml.ScalarEvent):
+            name = event.value
+        elif key == 'template':
+            _check_alias(event)
+            if not isinstance(event, yaml.SequenceStartEvent):
+                _skip_node(events, event)
+                continue
+            for item in _iter_sequence(events):
+                _check_alias(item)
+                if not isinstance(item, yaml.MappingStartEvent):
+                    _skip_node(events, item)
+                    continue
+                for tkey, tevent in _iter_mapping(events):
+                    if tkey == '<<':
+                        raise _AliasFound()
+                    if tkey == 'name':
+                        _check_alias(tevent)
+                    if (tkey == 'name' and
+                            isinstance(tevent, yaml.ScalarEvent)):
+                        templates.add(tevent.value)
+                    else:
+                        _skip_node(events, tevent)
+        else:
+            _skip_node(events, event)
+    return name, frozenset(templates)
+
+
+def _extract_project_templates(text):
+    # Walk the parser events instead of building the whole document,
+    # so the pipelines, jobs, and other sections are never turned
+    # into python objects.
+    try:
+        return _walk_project_templates(text)
+    except _AliasFound:
+        print('[project_config] zuul layout uses aliases in its '
+              'projects, loading all of it')
+    layout = _parse_zuul_layout(text)
+    return {
+        name: frozenset(t['name'] for t in p.get('template', []))
+        for name, p in layout[_VALIDATE_KEY].items()
+    }
+
+
+def _walk_project_templates(text):
+    templates = {}
+    events = yaml.parse(text, Loader=yamlutils.SafeLoader)
+    for event in events:
+        if not isinstance(event, yaml.MappingStartEvent):
+            _skip_node(events, event)
+            continue
+        for key, value in _iter_mapping(events):
+            if key == 'projects':
+                _check_alias(value)
+            if key != 'projects' or not isinstance(
+                    value, yaml.SequenceStartEvent):
+                _skip_node(events, value)
+                continue
+            for item in _iter_sequence(events):
+                _check_alias(item)
+                if not isinstance(item, yaml.MappingStartEvent):
+                    _skip_node(events, item)
+                    continue
+                name, project_templates = _read_project(events)
+                if name is not None:
+                    templates[name] = project_templates
+    return templates
+
+
 # Which jobs are needed for which release types.
 _RELEASE_JOBS_FOR_TYPE = {
     'std': [
@@ -64,6 +225,9 @@ def require_release_jobs_for_repo(deliverable_info, zuul_layout, repo,
                                   release_type):
     """Check the repository for release jobs.
 
+    zuul_layout may be the data from :func:`get_zuul_layout_data` or
+    the smaller mapping from :func:`get_zuul_project_templates`.
+
     Returns a list of tuples containing a message and a boolean
     indicating if the message is an error.
 
@@ -80,17 +244,21 @@ def require_release_jobs_for_repo(deliverable_info, zuul_layout, repo,
     if flags.has_flag(deliverable_info, repo, flags.RETIRED):
         return errors
 
-    if repo not in zuul_layout[_VALIDATE_KEY]:
+    if _VALIDATE_KEY in zuul_layout:
+        p = zuul_layout[_VALIDATE_KEY].get(repo)
+        templates = None if p is None else [
+            t['name']
+            for t in p.get('template', [])
+        ]
+    else:
+        templates = zuul_layout.get(repo)
+
+    if templates is None:
         errors.append(
             ('did not find %s in %s' % (repo, ZUUL_LAYOUT_FILENAME),
              True)
         )
     else:
-        p = zuul_layout[_VALIDATE_KEY][repo]
-        templates = [
-            t['name']
-            for t in p.get('template', [])
-        ]
         # NOTE(dhellmann): We don't mess around looking for individual
         # jobs, because we want projects to use the templates.
         expected_jobs = _RELEASE_JOBS_FOR_TYPE.get(
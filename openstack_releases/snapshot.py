@@ -0,0 +1,215 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Single-file, memory-mapped snapshot of the deliverable files.
+
+The snapshot holds the parsed (but not collapsed) content of every
+deliverable file, so read-only tools see exactly what is in the YAML
+files. The layout is::
+
+    header   magic, format version, and length of the index
+    index    pickled list of (path, series, deliverable, team,
+             offset, length, (mtime, size)) tuples, sorted by path
+    records  one pickled record per file, at the offsets given in
+             the index
+
+Opening a snapshot only reads the header and the index. Records are
+decoded from the memory map the first time they are requested. The
+modification time and size of each file, taken just before it was
+read, are kept in the index to tell when the snapshot is out of date.
+
+"""
+
+from __future__ import print_function
+
+import glob
+import mmap
+import os
+import os.path
+import struct
+import tempfile
+
+from six.moves import cPickle as pickle
+
+from openstack_releases import yamlutils
+
+FORMAT_VERSION = 2
+
+_MAGIC = b'RELSNAP\0'
+_HEADER = struct.Struct('!8sII')
+
+
+def _relative_path(root_dir, filename):
+    return '/'.join(os.path.relpath(filename, root_dir).split(os.sep))
+
+
+def _deliverable_files(root_dir):
+    return sorted(glob.glob(os.path.join(root_dir, '*/*.yaml')))
+
+
+def _file_stat(filename):
+    st = os.stat(filename)
+    return (st.st_mtime, st.st_size)
+
+
+def is_stale(root_dir, filename):
+    """Return boolean indicating whether the snapshot needs rebuilding.
+
+    The snapshot is stale if it is missing, if files were added or
+    removed since it was written, or if the modification time or size
+    of any file differs from the one seen when it was read.
+
+    """
+    try:
+        snap = Snapshot(filename)
+    except (IOError, OSError, ValueError):
+        return True
+    try:
+        known = snap.stats()
+    finally:
+        snap.close()
+    filenames = _deliverable_files(root_dir)
+    if set(known) != set(_relative_path(root_dir, f) for f in filenames):
+        return True
+    for name in filenames:
+        try:
+            stat = _file_stat(name)
+        except OSError:
+            return True
+        if stat != known[_relative_path(root_dir, name)]:
+            return True
+    return False
+
+
+def write_snapshot(root_dir, filename):
+    "Parse every deliverable file under root_dir into a new snapshot."
+    index = []
+    records = []
+    offset = 0
+    for yaml_file in _deliverable_files(root_dir):
+        print('[snapshot] reading %s' % yaml_file)
+        # Taken before reading, so an edit made while the snapshot is
+        # being written makes it stale instead of going unnoticed.
+        stat = _file_stat(yaml_file)
+        with open(yaml_file, 'r') as f:
+            d_info = yamlutils.load(f.read())
+        record = pickle.dumps(d_info, pickle.HIGHEST_PROTOCOL)
+        index.append((
+            _relative_path(root_dir, yaml_file),
+            os.path.basename(os.path.dirname(yaml_file)),
+            os.path.splitext(os.path.basename(yaml_file))[0],
+            d_info.get('team'),
+            offset,
+            len(record),
+            stat,
+        ))
+        records.append(record)
+        offset += len(record)
+    index_blob = pickle.dumps(index, pickle.HIGHEST_PROTOCOL)
+
+    dirname = os.path.dirname(os.path.abspath(filename))
+    fd, tmpname = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, FORMAT_VERSION, len(index_blob)))
+            f.write(index_blob)
+            for record in records:
+                f.write(record)
+        os.rename(tmpname, filename)
+    except:
+        os.unlink(tmpname)
+        raise
+    print('[snapshot] wrote %d files to %s' % (len(index), filename))
+
+
+class Snapshot(object):
+    """Read-only view of a snapshot file."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # mmap refuses empty files.
+                raise ValueError('%s is not a snapshot' % filename)
+        try:
+            magic, version, index_len = _HEADER.unpack_from(self._map, 0)
+            if magic != _MAGIC or version != FORMAT_VERSION:
+                raise ValueError('%s is not a version %s snapshot' %
+                                 (filename, FORMAT_VERSION))
+            start = _HEADER.size
+            self._records_start = start + index_len
+            self._index = pickle.loads(self._map[start:self._records_start])
+        except (struct.error, pickle.UnpicklingError, EOFError):
+            self._map.close()
+            raise ValueError('%s is not a snapshot' % filename)
+        except ValueError:
+            self._map.close()
+            raise
+        self._by_path = dict(
+            (entry[0], entry) for entry in self._index
+        )
+
+    def close(self):
+        self._map.close()
+
+    def paths(self):
+        "Return the relative paths of the files in the snapshot."
+        return [entry[0] for entry in self._index]
+
+    def entries(self):
+        """Return the index entries.
+
+        Each entry is a tuple containing the relative path, series,
+        deliverable name, and team.
+
+        """
+        return [entry[:4] for entry in self._index]
+
+    def stats(self):
+        """Return a dict mapping relative paths to (mtime, size) tuples.
+
+        The values are those of each file just before it was read.
+
+        """
+        return dict((entry[0], entry[6]) for entry in self._index)
+
+    def get(self, path):
+        """Return the parsed content of the file with the relative path.
+
+        Raises KeyError if the file is not in the snapshot.
+
+        """
+        offset, length = self._by_path[path][4:6]
+        start = self._records_start + offset
+        return pickle.loads(self._map[start:start + length])
+
+    def get_file(self, root_dir, filename):
+        """Return the parsed content of a deliverable file.
+
+        Falls back to reading the YAML file if it is not part of the
+        snapshot.
+
+        """
+        try:
+            return self.get(_relative_path(root_dir, filename))
+        except KeyError:
+            with open(filename, 'r') as f:
+                return yamlutils.load(f.read())
+
+
+def open_snapshot(root_dir, filename):
+    "Return the snapshot in filename, rebuilding it first if it is stale."
+    if is_stale(root_dir, filename):
+        write_snapshot(root_dir, filename)
+    return Snapshot(filename)
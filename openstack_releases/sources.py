@@ -0,0 +1,160 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Places to read the governance and project-config data from.
+
+A location is given as a string, so it can come from a command line
+option or an environment variable, and may be one of:
+
+``http://...`` or ``https://...``
+  A URL, fetched through :func:`httputils.get_document`.
+``PATH``
+  A local copy of the file, or a checkout of the repository holding
+  it.
+``PATH@REF``
+  A local git repository and a ref in it, such as
+  ``/opt/git/openstack/governance@origin/master``. The file is read
+  with ``git show REF:FILE``, so the repository does not need a
+  checkout and may be bare.
+
+Files read from a git ref are parsed once per process for each ref.
+The parsed form is also saved in the cache directory under the id of
+the blob, so other processes reading the same version of the file do
+not parse it again.
+
+"""
+
+from __future__ import print_function
+
+import hashlib
+import os
+import os.path
+import subprocess
+import threading
+
+from six.moves import cPickle as pickle
+
+from openstack_releases import cache
+from openstack_releases import httputils
+
+
+class URLSource(object):
+    "A document downloaded over HTTP."
+
+    def __init__(self, url):
+        self.url = url
+
+    def load(self, loader, local_name=None):
+        return httputils.get_document(self.url, loader)
+
+
+class FileSource(object):
+    "A local copy of a document, or a checkout holding it."
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, loader, local_name=None):
+        filename = self.path
+        if os.path.isdir(filename) and local_name:
+            filename = os.path.join(filename, *local_name.split('/'))
+        with open(filename, 'r') as f:
+            return loader(f.read())
+
+
+class GitRefSource(object):
+    """A document read from a ref of a local git repository.
+
+    :param repo_dir: The repository, which may be bare.
+    :param ref: Anything git can resolve to a commit.
+
+    """
+
+    def __init__(self, repo_dir, ref, cache_dir=cache.DEFAULT_CACHE_DIR):
+        self.repo_dir = os.path.abspath(repo_dir)
+        self.ref = ref
+        self.cache_dir = cache_dir
+
+    def _git(self, *args):
+        return subprocess.check_output(
+            ('git',) + args,
+            cwd=self.repo_dir,
+        ).decode('utf-8')
+
+    def _cache_file(self, blob, loader):
+        key = hashlib.sha1(
+            ('%s\0%s' % (blob, httputils.loader_name(loader))).encode('utf-8')
+        ).hexdigest()
+        return os.path.join(self.cache_dir, 'git-documents', key + '.pickle')
+
+    def load(self, loader, local_name=None):
+        if not local_name:
+            raise ValueError('%s@%s needs the name of a file to read' %
+                             (self.repo_dir, self.ref))
+        key = (self.repo_dir, self.ref, local_name,
+               httputils.loader_name(loader))
+        with _lock:
+            if key in _memo:
+                return _memo[key]
+
+        spec = '%s:%s' % (self.ref, local_name)
+        blob = self._git('rev-parse', '--verify', spec).strip()
+        cache_file = self._cache_file(blob, loader) if self.cache_dir else None
+        parsed = None
+        if cache_file:
+            try:
+                with open(cache_file, 'rb') as f:
+                    parsed = pickle.load(f)
+            except Exception:
+                parsed = None
+        if parsed is None:
+            print('[sources] reading %s from %s' % (spec, self.repo_dir))
+            parsed = loader(self._git('cat-file', 'blob', blob))
+            if cache_file:
+                try:
+                    httputils.write_atomic(
+                        cache_file,
+                        pickle.dumps(parsed, pickle.HIGHEST_PROTOCOL),
+                    )
+                except (IOError, OSError) as e:
+                    print('[sources] could not cache %s: %s' % (spec, e))
+
+        with _lock:
+            _memo[key] = parsed
+        return parsed
+
+
+_lock = threading.Lock()
+_memo = {}
+
+
+def get_source(location):
+    "Return the source object for a location string."
+    if location.startswith(('http://', 'https://')):
+        return URLSource(location)
+    if not os.path.exists(location) and '@' in location:
+        repo_dir, ref = location.rsplit('@', 1)
+        if os.path.isdir(repo_dir) and ref:
+            return GitRefSource(repo_dir, ref)
+    return FileSource(location)
+
+
+def load(location, loader, local_name=None):
+    """Return loader(text) for the document at location.
+
+    :param location: A location string, as described above.
+    :param loader: Callable that converts the text of the document to
+        the data returned. The result must be picklable.
+    :param local_name: Path of the document inside its repository.
+
+    """
+    return get_source(location).load(loader, local_name)
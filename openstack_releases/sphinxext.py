@@ -14,6 +14,7 @@
 
 import itertools
 import operator
+import os
 import os.path
 
 from docutils import nodes
@@ -77,7 +78,21 @@ def _initialize_team_data(app):
     global _deliverables
     global _all_teams
 
-    _deliverables = deliverable.Deliverables('deliverables')
+    # Set RELEASES_LOAD_WORKERS to parse the deliverable files with a
+    # pool of processes. A value of 0 uses one process per CPU.
+    workers = int(os.environ.get('RELEASES_LOAD_WORKERS', '1')) or None
+    # The data stays resident for the whole build, so keep it in the
+    # compact store. Set RELEASES_SNAPSHOT to the name of a snapshot
+    # file to load from it, rebuilding it when it is out of date.
+    _deliverables = deliverable.Deliverables(
+        'deliverables',
+        workers=workers,
+        compact=True,
+        snapshot=os.environ.get('RELEASES_SNAPSHOT') or None,
+    )
+    # Set RELEASES_GOVERNANCE_PROJECTS to read the team data from
+    # somewhere else, such as a local governance repository at a
+    # given ref ("/path/to/governance@origin/master").
     team_data = governance.get_team_data()
     for tn, td in team_data.items():
         _all_teams[tn] = td
@@ -17,7 +17,14 @@ import textwrap
 
 import six
 import yaml
-import yamlordereddictloader
+
+# Use the libyaml-backed parser when PyYAML was built with it. It is
+# several times faster than the pure-Python implementation and
+# produces the same data.
+try:
+    _BaseSafeLoader = yaml.CSafeLoader
+except AttributeError:
+    _BaseSafeLoader = yaml.SafeLoader
 
 
 def _has_newline(data):
@@ -99,9 +106,62 @@ def dumps(obj):
     return buff.getvalue()
 
 
+class _OrderedMappingMixin(object):
+    """Loader mixin that builds OrderedDict instances for mappings."""
+
+    def construct_yaml_ordered_map(self, node):
+        data = collections.OrderedDict()
+        yield data
+        data.update(self.construct_ordered_mapping(node))
+
+    def construct_ordered_mapping(self, node, deep=False):
+        if not isinstance(node, yaml.MappingNode):
+            raise yaml.constructor.ConstructorError(
+                None, None,
+                'expected a mapping node, but found %s' % node.id,
+                node.start_mark)
+        self.flatten_mapping(node)
+        mapping = collections.OrderedDict()
+        for key_node, value_node in node.value:
+            key = self.construct_object(key_node, deep=deep)
+            try:
+                hash(key)
+            except TypeError:
+                raise yaml.constructor.ConstructorError(
+                    'while constructing a mapping', node.start_mark,
+                    'found unhashable key', key_node.start_mark)
+            mapping[key] = self.construct_object(value_node, deep=deep)
+        return mapping
+
+
+class PureSafeLoader(yaml.SafeLoader):
+    """The pure-Python safe loader, used to cross-check SafeLoader."""
+
+
+class PureOrderedSafeLoader(_OrderedMappingMixin, yaml.SafeLoader):
+    """The pure-Python ordered loader, used to cross-check loads()."""
+
+
+class SafeLoader(_BaseSafeLoader):
+    """Safe loader using libyaml when it is available."""
+
+
+class OrderedSafeLoader(_OrderedMappingMixin, _BaseSafeLoader):
+    """Safe loader that retains key ordering, using libyaml if available."""
+
+
+for _loader in [PureOrderedSafeLoader, OrderedSafeLoader]:
+    _loader.add_constructor('tag:yaml.org,2002:map',
+                            _loader.construct_yaml_ordered_map)
+    _loader.add_constructor('tag:yaml.org,2002:omap',
+                            _loader.construct_yaml_ordered_map)
+
+
+def load(stream):
+    """Load a yaml blob or stream as plain python data."""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
 def loads(blob):
     """Load a yaml blob and retain key ordering."""
-    # This does use load, which is unsafe, but should be ok
-    # for what we are loading here in this program; we should
-    # be able to fix that in the future (if it matters).
-    return yaml.load(blob, Loader=yamlordereddictloader.Loader)
+    return yaml.load(blob, Loader=OrderedSafeLoader)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Verify that clone_repo() switches branches of an existing clone.
+
+list-changes clones each repository once per run, so when it is given
+deliverable files from two series of the same repository the second
+call to gitutils.clone_repo() has to move the existing clone to the
+other branch. This builds a scratch upstream repository with a master
+and a stable branch and checks that HEAD follows the branch asked
+for, through the mirror pool, through a history-only clone, and
+through zuul-cloner when it is installed.
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+
+scratch = tempfile.mkdtemp(prefix='releases-check-')
+remote_dir = os.path.join(scratch, 'remote')
+# These are read when the modules are imported.
+os.environ['RELEASES_GIT_REMOTE'] = remote_dir
+os.environ['RELEASES_MIRROR_DIR'] = ''
+os.environ['ZUUL_CACHE_DIR'] = os.path.join(scratch, 'no-cache')
+
+from openstack_releases import gitutils  # noqa
+from openstack_releases import mirrors  # noqa
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    '--no-cleanup',
+    dest='cleanup',
+    default=True,
+    action='store_false',
+    help='do not remove the scratch repositories',
+)
+args = parser.parse_args()
+
+env = dict(os.environ,
+           GIT_AUTHOR_NAME='check', GIT_AUTHOR_EMAIL='check@example.com',
+           GIT_COMMITTER_NAME='check',
+           GIT_COMMITTER_EMAIL='check@example.com')
+repo = 'openstack/example'
+
+
+def git(*cmd, **kwds):
+    return subprocess.check_output(
+        ('git',) + cmd, env=env, **kwds
+    ).decode('utf-8').strip()
+
+
+def make_upstream():
+    work = os.path.join(scratch, 'work')
+    git('init', '-q', work)
+    git('checkout', '-q', '-b', 'master', cwd=work)
+    git('commit', '-q', '--allow-empty', '-m', 'first', cwd=work)
+    git('tag', '-a', '-m', '1.0.0', '1.0.0', cwd=work)
+    git('checkout', '-q', '-b', 'stable/ocata', cwd=work)
+    git('commit', '-q', '--allow-empty', '-m', 'stable fix', cwd=work)
+    git('tag', '-a', '-m', '1.0.1', '1.0.1', cwd=work)
+    git('checkout', '-q', 'master', cwd=work)
+    git('commit', '-q', '--allow-empty', '-m', 'second', cwd=work)
+    git('tag', '-a', '-m', '1.1.0', '1.1.0', cwd=work)
+    upstream = os.path.join(remote_dir, repo)
+    git('clone', '-q', '--bare', work, upstream)
+    return {
+        'master': git('rev-parse', 'master', cwd=work),
+        'stable/ocata': git('rev-parse', 'stable/ocata', cwd=work),
+    }
+
+
+def have_zuul_cloner():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            subprocess.call(['zuul-cloner', '--help'], stdout=devnull)
+    except OSError:
+        return False
+    return True
+
+
+def check(label, heads, **kwds):
+    workdir = os.path.join(scratch, label)
+    failures = 0
+    # One file from each series of the same repository, then back
+    # again, the way list-changes walks its input files, and finally
+    # a branch the repository does not have.
+    for branch, expected in [('master', 'master'),
+                             ('stable/ocata', 'stable/ocata'),
+                             ('master', 'master'),
+                             ('stable/newton', 'master')]:
+        gitutils.clone_repo(workdir, repo, branch=branch, **kwds)
+        sha = gitutils.sha_for_tag(workdir, repo, 'HEAD')
+        if sha == heads[expected]:
+            print('%s: %s OK' % (label, branch))
+        else:
+            print('%s: %s FAILED, HEAD is %s instead of %s' %
+                  (label, branch, sha, heads[expected]))
+            failures += 1
+    return failures
+
+
+failures = 0
+try:
+    heads = make_upstream()
+    failures += check('history-only', heads, history_only=True)
+    mirrors.DEFAULT_DIR = os.path.join(scratch, 'mirrors')
+    mirrors._pool = mirrors.MirrorPool(mirrors.DEFAULT_DIR)
+    failures += check('mirror-pool', heads)
+    mirrors._pool = None
+    mirrors.DEFAULT_DIR = ''
+    if have_zuul_cloner():
+        failures += check('zuul-cloner', heads)
+    else:
+        print('zuul-cloner: not installed, skipped')
+    gitutils.close_object_readers()
+finally:
+    if args.cleanup:
+        shutil.rmtree(scratch)
+    else:
+        print('not cleaning up %s' % scratch)
+
+if failures:
+    raise SystemExit('ERROR: %d checks failed' % failures)
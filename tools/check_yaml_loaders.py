@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Verify that the libyaml and pure-Python loaders agree on every file.
+"""
+
+from __future__ import print_function
+
+import argparse
+import glob
+import os.path
+import sys
+import time
+
+import yaml
+
+from openstack_releases import yamlutils
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    'root',
+    nargs='?',
+    default='deliverables',
+    help='directory containing the deliverable files (default=%(default)s)',
+)
+args = parser.parse_args()
+
+if not yaml.__with_libyaml__:
+    print('PyYAML was built without libyaml, nothing to compare')
+    sys.exit(0)
+
+filenames = sorted(glob.glob(os.path.join(args.root, '*/*.yaml')))
+pairs = [
+    ('plain', yamlutils.PureSafeLoader, yamlutils.SafeLoader),
+    ('ordered', yamlutils.PureOrderedSafeLoader, yamlutils.OrderedSafeLoader),
+]
+timings = {}
+mismatches = 0
+
+for filename in filenames:
+    with open(filename, 'rb') as f:
+        blob = f.read()
+    for name, pure_loader, fast_loader in pairs:
+        start = time.time()
+        expected = yaml.load(blob, Loader=pure_loader)
+        middle = time.time()
+        actual = yaml.load(blob, Loader=fast_loader)
+        end = time.time()
+        pure_time, fast_time = timings.get(name, (0.0, 0.0))
+        timings[name] = (pure_time + middle - start, fast_time + end - middle)
+        if expected != actual:
+            print('MISMATCH %s loading %s' % (name, filename))
+            mismatches += 1
+
+for name, (pure_time, fast_time) in sorted(timings.items()):
+    print('%s: pure %.2fs libyaml %.2fs (%.1fx)' %
+          (name, pure_time, fast_time, pure_time / max(fast_time, 1e-9)))
+print('%d files checked, %d mismatches' % (len(filenames), mismatches))
+sys.exit(1 if mismatches else 0)
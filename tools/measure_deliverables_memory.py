@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Report the memory used by the loaded deliverables data.
+
+Compares the plain parsed data with the compact release store, on the
+real tree and on a synthetic tree made of several copies of it.
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+
+try:
+    import tracemalloc
+except ImportError:
+    print('tracemalloc is required (python 3.4 or later)')
+    sys.exit(1)
+
+from openstack_releases import deliverable
+
+
+def measure(root, compact):
+    devnull = open(os.devnull, 'w')
+    sys.stdout = devnull
+    try:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        d = deliverable.Deliverables(root, cache_dir=None, compact=compact)
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    finally:
+        sys.stdout = sys.__stdout__
+        devnull.close()
+    return d, after - before
+
+
+def report(title, root):
+    plain, plain_size = measure(root, False)
+    del plain
+    packed, packed_size = measure(root, True)
+    del packed
+    print('%s: plain %.1f MiB, compact %.1f MiB (%.0f%%)' % (
+        title,
+        plain_size / 1048576.0,
+        packed_size / 1048576.0,
+        100.0 * packed_size / plain_size,
+    ))
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    '--copies',
+    type=int,
+    default=10,
+    help='number of copies of the tree in the synthetic run '
+    '(default=%(default)s)',
+)
+parser.add_argument(
+    'root',
+    nargs='?',
+    default='deliverables',
+    help='directory containing the deliverable files (default=%(default)s)',
+)
+args = parser.parse_args()
+
+report('real tree', args.root)
+
+synthetic = tempfile.mkdtemp(prefix='releases-')
+try:
+    for series_dir in glob.glob(os.path.join(args.root, '*')):
+        series = os.path.basename(series_dir)
+        for n in range(args.copies):
+            shutil.copytree(
+                series_dir,
+                os.path.join(synthetic, '%s-%d' % (series, n)),
+            )
+    report('%dx synthetic tree' % args.copies, synthetic)
+finally:
+    shutil.rmtree(synthetic)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare process counts and time for resolving release tags.
+
+Builds a scratch repository with one tagged commit per release and
+resolves every tag twice, the way validate-request does, first by
+running "git log" for each lookup and then through
+gitutils.sha_for_tag(), which reads every ref once and falls back to
+a shared cat-file reader.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from openstack_releases import gitcache
+from openstack_releases import gitutils
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    '--releases', '-n',
+    type=int,
+    default=300,
+    help='number of tagged releases to create (default=%(default)s)',
+)
+parser.add_argument(
+    '--no-cleanup',
+    dest='cleanup',
+    default=True,
+    action='store_false',
+    help='do not remove the scratch repository',
+)
+args = parser.parse_args()
+
+_spawned = [0]
+_real_popen = subprocess.Popen
+
+
+class CountingPopen(_real_popen):
+    def __init__(self, *args, **kwds):
+        _spawned[0] += 1
+        super(CountingPopen, self).__init__(*args, **kwds)
+
+
+def git(*cmd, **kwds):
+    return subprocess.check_output(('git',) + cmd, **kwds)
+
+
+def sha_with_log(repo_dir, version):
+    return git('log', version, '-n', '1', '--pretty=format:%H',
+               cwd=repo_dir).strip().decode('ascii')
+
+
+def measure(label, func):
+    _spawned[0] = 0
+    subprocess.Popen = CountingPopen
+    try:
+        start = time.time()
+        results = [func(v) for v in versions for i in range(2)]
+        elapsed = time.time() - start
+    finally:
+        subprocess.Popen = _real_popen
+    print('%-10s %5d lookups %5d processes %8.3fs' %
+          (label, len(results), _spawned[0], elapsed))
+    return results
+
+
+workdir = tempfile.mkdtemp(prefix='releases-measure-')
+repo = 'openstack/example'
+repo_dir = os.path.join(workdir, repo)
+env = dict(os.environ,
+           GIT_AUTHOR_NAME='measure', GIT_AUTHOR_EMAIL='measure@example.com',
+           GIT_COMMITTER_NAME='measure',
+           GIT_COMMITTER_EMAIL='measure@example.com')
+try:
+    os.makedirs(repo_dir)
+    git('init', '-q', cwd=repo_dir)
+    versions = []
+    for i in range(args.releases):
+        version = '%d.%d.0' % (i // 10, i % 10)
+        git('commit', '-q', '--allow-empty', '-m', version,
+            cwd=repo_dir, env=env)
+        git('tag', '-a', '-m', version, version, cwd=repo_dir, env=env)
+        versions.append(version)
+    print('%d releases in %s' % (len(versions), repo_dir))
+
+    gitcache.disable()
+    before = measure('git log', lambda v: sha_with_log(repo_dir, v))
+    after = measure('gitutils',
+                    lambda v: gitutils.sha_for_tag(workdir, repo, v))
+    gitutils.close_object_readers()
+    gitutils.forget_ref_snapshot(workdir, repo)
+    if before != after:
+        raise SystemExit('ERROR: results differ')
+finally:
+    if args.cleanup:
+        shutil.rmtree(workdir)
+    else:
+        print('not cleaning up %s' % workdir)
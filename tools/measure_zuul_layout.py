@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare time and memory for reading the zuul layout.
+
+Parses zuul/layout.yaml with the full loader used by
+project_config.get_zuul_layout_data() and with the event-based
+extraction used by project_config.get_zuul_project_templates(), and
+checks that both give the same templates for every repository.
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import random
+import sys
+import time
+
+import yaml
+
+try:
+    import tracemalloc
+except ImportError:
+    print('tracemalloc is required (python 3.4 or later)')
+    sys.exit(1)
+
+from openstack_releases import project_config
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    '--repeat', '-n',
+    type=int,
+    default=3,
+    help='number of timing runs, the best is reported (default=%(default)s)',
+)
+parser.add_argument(
+    '--synthetic',
+    type=int,
+    metavar='PROJECTS',
+    default=2000,
+    help=('number of projects in the generated layout used when no file '
+          'is given (default=%(default)s)'),
+)
+parser.add_argument(
+    'layout',
+    nargs='?',
+    help='path to a copy of zuul/layout.yaml',
+)
+args = parser.parse_args()
+
+
+def synthetic_layout(num_projects):
+    rng = random.Random(42)
+    templates = ['python-jobs', 'openstack-server-release-jobs',
+                 'publish-to-pypi', 'check-requirements', 'docs-on-rtd',
+                 'translation-jobs', 'api-ref-jobs', 'python35-jobs']
+    jobs = []
+    for j in range(num_projects * 2):
+        jobs.append({
+            'name': '^gate-job%d-.*$' % j,
+            'branch': '^(?!stable/newton).*$',
+            'voting': False,
+            'files': ['^src/.*$', '^doc/.*$'],
+        })
+    projects = []
+    for p in range(num_projects):
+        projects.append({
+            'name': 'openstack/project%d' % p,
+            'template': [{'name': t}
+                         for t in rng.sample(templates, rng.randint(1, 5))],
+            'check': ['gate-project%d-job%d' % (p, j) for j in range(8)],
+            'gate': ['gate-project%d-job%d' % (p, j) for j in range(8)],
+        })
+    return yaml.safe_dump({
+        'pipelines': [{'name': 'check',
+                       'manager': 'IndependentPipelineManager'}],
+        'jobs': jobs,
+        'projects': projects,
+    }, default_flow_style=False)
+
+
+def measure(func):
+    times = []
+    for i in range(args.repeat):
+        start = time.time()
+        func(text)
+        times.append(time.time() - start)
+    tracemalloc.start()
+    result = func(text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, min(times), peak
+
+
+def full_templates(layout):
+    return {
+        name: frozenset(t['name'] for t in p.get('template', []))
+        for name, p in layout[project_config._VALIDATE_KEY].items()
+    }
+
+
+if args.layout:
+    with open(args.layout, 'r') as f:
+        text = f.read()
+else:
+    text = synthetic_layout(args.synthetic)
+print('%d bytes of layout' % len(text))
+
+full, full_time, full_peak = measure(project_config._parse_zuul_layout)
+stream, stream_time, stream_peak = measure(
+    project_config._extract_project_templates)
+print('full load: %8.3fs  peak %7.1f MiB' %
+      (full_time, full_peak / 1048576.0))
+print('streaming: %8.3fs  peak %7.1f MiB' %
+      (stream_time, stream_peak / 1048576.0))
+if full_templates(full) != stream:
+    raise SystemExit('ERROR: results differ')
+print('%d projects, results match' % len(stream))
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Time sorting and collapsing the release history of deliverable files.
+"""
+
+from __future__ import print_function
+
+import argparse
+import copy
+import glob
+import os
+import sys
+import time
+
+from openstack_releases import deliverable
+from openstack_releases import yamlutils
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    '--repeat', '-n',
+    type=int,
+    default=5,
+    help='number of timing runs, the best is reported (default=%(default)s)',
+)
+parser.add_argument(
+    'pattern',
+    nargs='?',
+    default='deliverables/_independent/*.yaml',
+    help='glob pattern for the files to load (default=%(default)s)',
+)
+args = parser.parse_args()
+
+filenames = sorted(glob.glob(args.pattern))
+data = []
+for filename in filenames:
+    with open(filename, 'r') as f:
+        data.append((filename, yamlutils.load(f.read())))
+num_releases = sum(len(d.get('releases', [])) for f, d in data)
+print('%d files with %d releases' % (len(filenames), num_releases))
+
+cold = []
+warm = []
+devnull = open(os.devnull, 'w')
+for i in range(args.repeat):
+    deliverable._version_info_cache.clear()
+    for results in (cold, warm):
+        work = copy.deepcopy(data)
+        sys.stdout = devnull
+        try:
+            start = time.time()
+            for filename, d_info in work:
+                deliverable._collapse_deliverable_history(filename, d_info)
+            results.append(time.time() - start)
+        finally:
+            sys.stdout = sys.__stdout__
+print('cold version cache: %.4fs' % min(cold))
+print('warm version cache: %.4fs' % min(warm))
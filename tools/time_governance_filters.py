@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Time filtering the governance repositories by tag.
+"""
+
+from __future__ import print_function
+
+import argparse
+import random
+import time
+
+from openstack_releases import governance
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    '--repeat', '-n',
+    type=int,
+    default=5,
+    help='number of timing runs, the best is reported (default=%(default)s)',
+)
+parser.add_argument(
+    '--synthetic',
+    type=int,
+    metavar='TEAMS',
+    help=('generate team data with this many teams instead of '
+          'reading projects.yaml'),
+)
+parser.add_argument(
+    'projects',
+    nargs='?',
+    default=governance.PROJECTS_LIST,
+    help=('URL or path of projects.yaml, or a governance checkout '
+          '(default=%(default)s)'),
+)
+args = parser.parse_args()
+
+
+def synthetic_team_data(num_teams):
+    rng = random.Random(42)
+    tags = ['release:cycle-with-milestones', 'release:cycle-with-intermediary',
+            'release:independent', 'type:service', 'type:library',
+            'type:other', 'team:diverse-affiliation', 'stable:follows-policy']
+    data = {}
+    for t in range(num_teams):
+        deliverables = {}
+        for d in range(rng.randint(1, 15)):
+            deliverables['team%d-deliverable%d' % (t, d)] = {
+                'repos': ['openstack/team%d-repo%d-%d' % (t, d, r)
+                          for r in range(rng.randint(1, 3))],
+                'tags': rng.sample(tags, rng.randint(1, 3)),
+            }
+        data['team%d' % t] = {
+            'deliverables': deliverables,
+            'tags': rng.sample(tags, rng.randint(0, 1)),
+        }
+    return data
+
+
+def best_time(func):
+    times = []
+    for i in range(args.repeat):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+if args.synthetic:
+    team_data = synthetic_team_data(args.synthetic)
+else:
+    team_data = governance.get_team_data(args.projects)
+
+teams = [governance.Team(n, i) for n, i in team_data.items()]
+repos = [
+    r
+    for t in teams
+    for d in t.deliverables.values()
+    for r in d.repositories.values()
+]
+all_tags = sorted(set(tag for r in repos for tag in r.tags))
+print('%d teams, %d repositories, %d tags' %
+      (len(teams), len(repos), len(all_tags)))
+
+
+def build():
+    [governance.Team(n, i) for n, i in team_data.items()]
+
+
+def scan():
+    for tag in all_tags:
+        [r for r in repos if tag in r.tags and r.code_related]
+
+
+def types():
+    [r.deliverable.type for r in repos]
+
+
+def get_repositories():
+    for tag in all_tags:
+        list(governance.get_repositories(team_data, tags=[tag],
+                                         code_only=True))
+
+
+print('build team objects:            %.4fs' % best_time(build))
+print('scan repo.tags for each tag:   %.4fs' % best_time(scan))
+print('deliverable type of each repo: %.4fs' % best_time(types))
+print('get_repositories for each tag: %.4fs' % best_time(get_repositories))